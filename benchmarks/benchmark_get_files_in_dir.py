@@ -0,0 +1,55 @@
+'''
+Compares the serial and the parallel walk of ``get_files_in_dir``.
+
+Usage::
+
+    python benchmarks/benchmark_get_files_in_dir.py --files 1000000 --workers 8
+
+Pass ``--root`` to benchmark an existing tree (e.g. on NFS) instead of a synthetic one.
+'''
+import argparse
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import get_files_in_dir  # noqa: E402
+from synthetic_tree import create_wide_tree  # noqa: E402
+
+
+def _measure(label, function):
+    start = perf_counter()
+    result = function()
+    print(f'{label:<30} {perf_counter() - start:8.3f} s  ({len(result)} files)')
+    return result
+
+
+def run(root, workers):
+    serial = _measure('serial', lambda: get_files_in_dir(root))
+    ordered = _measure(f'parallel ordered ({workers})', lambda: get_files_in_dir(root, workers=workers))
+    unordered = _measure(f'parallel unordered ({workers})', lambda: get_files_in_dir(root, workers=workers, ordered=False))
+    assert serial == ordered
+    assert sorted(serial) == sorted(unordered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000000, help='number of files in the synthetic tree')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--root', help='walk an existing directory instead of a synthetic tree')
+    args = parser.parse_args()
+
+    if args.root:
+        run(args.root, args.workers)
+    else:
+        with TemporaryDirectory(prefix='benchmark_common_helper_files') as tmp_dir:
+            print(f'creating {args.files} files in {tmp_dir} ...')
+            create_wide_tree(tmp_dir, args.files)
+            run(tmp_dir, args.workers)
+
+
+if __name__ == '__main__':
+    main()
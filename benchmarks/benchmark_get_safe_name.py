@@ -0,0 +1,51 @@
+'''
+Compares ``get_safe_name`` and ``get_safe_names`` with the former character filter implementation.
+
+Usage::
+
+    python benchmarks/benchmark_get_safe_name.py --names 1000000
+'''
+import argparse
+import random
+import string
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import get_safe_name, get_safe_names  # noqa: E402
+from common_helper_files.fail_safe_file_operations import SAFE_NAME_CHARACTERS  # noqa: E402
+
+
+def get_safe_name_character_filter(file_name, max_size=200, valid_characters=SAFE_NAME_CHARACTERS):
+    allowed_charachters = set(valid_characters)
+    safe_name = ''.join(filter(lambda x: x in allowed_charachters, file_name)).replace(' ', '_')
+    return safe_name[:max_size]
+
+
+def _measure(label, function, reference_duration=None):
+    start = perf_counter()
+    result = function()
+    duration = perf_counter() - start
+    speedup = f'  ({reference_duration / duration:.1f}x)' if reference_duration else ''
+    print(f'{label:<30} {duration:8.3f} s{speedup}')
+    return result, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=1000000, help='number of file names')
+    args = parser.parse_args()
+
+    alphabet = string.printable + 'äöü€😀'
+    names = [''.join(random.choices(alphabet, k=random.randint(5, 60))) for _ in range(args.names)]
+    expected, reference = _measure('character filter', lambda: [get_safe_name_character_filter(name) for name in names])
+    single, _ = _measure('get_safe_name', lambda: [get_safe_name(name) for name in names], reference)
+    batch, _ = _measure('get_safe_names', lambda: get_safe_names(names), reference)
+    _measure('get_safe_names (deduplicate)', lambda: get_safe_names(names, deduplicate=True), reference)
+    assert expected == single == batch
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''
+Measures the import time of ``common_helper_files`` in fresh interpreters. "all names" resolves every name in
+``__all__`` and therefore corresponds to the former eager package import.
+
+Usage::
+
+    python benchmarks/benchmark_import_time.py --runs 50
+'''
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+REPOSITORY = str(Path(__file__).absolute().parent.parent)
+
+VARIANTS = [
+    ('interpreter only', 'pass'),
+    ('import common_helper_files', 'import common_helper_files'),
+    ('from ... import get_binary_from_file', 'from common_helper_files import get_binary_from_file'),
+    ('from ... import get_version_string_from_git', 'from common_helper_files import get_version_string_from_git'),
+    ('all names (eager import)', 'import common_helper_files as c; [getattr(c, name) for name in c.__all__]'),
+]
+
+
+def measure(code, runs):
+    environment = dict(os.environ, PYTHONPATH=REPOSITORY, PYTHONDONTWRITEBYTECODE='')
+    durations = []
+    for _ in range(runs):
+        start = perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=environment, check=True)
+        durations.append(perf_counter() - start)
+    return median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=30, help='interpreter starts per variant')
+    args = parser.parse_args()
+
+    measure('import common_helper_files as c; [getattr(c, name) for name in c.__all__]', 1)  # compile byte code
+    baseline = None
+    for label, code in VARIANTS:
+        duration = measure(code, args.runs)
+        baseline = duration if baseline is None else baseline
+        print(f'{label:<45} {duration * 1000:8.1f} ms  (+{(duration - baseline) * 1000:6.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Measures how ``map_files_in_dir`` scales with the number of worker processes for a CPU-bound function (Shannon
+entropy computed in pure Python) compared to a sequential loop over ``safe_rglob`` and ``get_binary_from_file``.
+
+Usage::
+
+    python benchmarks/benchmark_map_files.py --files 2000 --size 64
+'''
+import argparse
+import math
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import get_binary_from_file, map_files_in_dir, safe_rglob  # noqa: E402
+from synthetic_tree import create_wide_tree  # noqa: E402
+
+
+def get_entropy(binary):
+    if not binary:
+        return 0.0
+    return -sum(count / len(binary) * math.log2(count / len(binary)) for count in Counter(binary).values())
+
+
+def run(directory, max_workers):
+    start = perf_counter()
+    for path in safe_rglob(Path(directory), include_directories=False):
+        get_entropy(get_binary_from_file(path))
+    sequential = perf_counter() - start
+    print(f'{"sequential":<20} {sequential:8.3f} s')
+    workers = 1
+    while workers <= max_workers:
+        start = perf_counter()
+        for _ in map_files_in_dir(get_entropy, directory, workers=workers):
+            pass
+        duration = perf_counter() - start
+        print(f'{f"{workers} workers":<20} {duration:8.3f} s  speedup {sequential / duration:5.2f}')
+        workers *= 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000, help='number of files in the synthetic tree')
+    parser.add_argument('--size', type=int, default=64, help='file size in KiB')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='maximum number of worker processes')
+    parser.add_argument('--directory', help='benchmark an existing tree instead of a synthetic one')
+    args = parser.parse_args()
+
+    if args.directory:
+        run(args.directory, args.workers)
+    else:
+        with TemporaryDirectory(prefix='benchmark_common_helper_files') as tmp_dir:
+            create_wide_tree(tmp_dir, args.files, files_per_dir=100, file_size=args.size * 1024)
+            run(tmp_dir, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+'''
+Compares the throughput of ``read_in_chunks`` and ``read_into_chunks`` while computing a CRC32 checksum of a file.
+
+Usage::
+
+    python benchmarks/benchmark_read_in_chunks.py --size 1024 --file /path/to/large/image
+'''
+import argparse
+import os
+import sys
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import read_in_chunks, read_into_chunks  # noqa: E402
+from common_helper_files.file_functions import MIN_AUTO_CHUNK_SIZE  # noqa: E402
+
+VARIANTS = [
+    ('read_in_chunks (1 KiB)', lambda file_object: read_in_chunks(file_object)),
+    (f'read_in_chunks ({MIN_AUTO_CHUNK_SIZE // 1024} KiB)', lambda file_object: read_in_chunks(file_object, chunk_size=MIN_AUTO_CHUNK_SIZE)),
+    ('read_into_chunks (auto)', lambda file_object: read_into_chunks(file_object)),
+    ('read_into_chunks (overlap 64)', lambda file_object: read_into_chunks(file_object, overlap=64)),
+]
+
+
+def run(file_path):
+    size = os.path.getsize(file_path)
+    for label, chunk_generator in VARIANTS:
+        checksum = 0
+        start = perf_counter()
+        with open(file_path, 'rb') as file_object:
+            for chunk in chunk_generator(file_object):
+                checksum = zlib.crc32(chunk, checksum)
+        duration = perf_counter() - start
+        print(f'{label:<30} {duration:8.3f} s  {size / duration / 1024 ** 2:10.1f} MiB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1024, help='size of the synthetic file in MiB')
+    parser.add_argument('--file', help='benchmark an existing file instead of a synthetic one')
+    args = parser.parse_args()
+
+    if args.file:
+        run(args.file)
+    else:
+        with TemporaryDirectory(prefix='benchmark_common_helper_files') as tmp_dir:
+            file_path = Path(tmp_dir, 'data')
+            with file_path.open('wb') as file_object:
+                for _ in range(args.size):
+                    file_object.write(os.urandom(1024 ** 2))
+            run(str(file_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+Measures the cost of the durability levels of ``write_binary_to_file``.
+
+Usage::
+
+    python benchmarks/benchmark_write_binary_to_file.py --files 1000 --size 65536 --directory /some/disk
+'''
+import argparse
+import os
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import write_binary_to_file  # noqa: E402
+
+DURABILITY_LEVELS = [
+    ('plain', {}),
+    ('fsync', {'fsync': True}),
+    ('atomic', {'atomic': True}),
+    ('atomic + fsync', {'atomic': True, 'fsync': True}),
+]
+
+
+def run(directory, file_count, file_size):
+    content = os.urandom(file_size)
+    for label, kwargs in DURABILITY_LEVELS:
+        with TemporaryDirectory(prefix='benchmark_common_helper_files', dir=directory) as tmp_dir:
+            start = perf_counter()
+            for index in range(file_count):
+                write_binary_to_file(content, Path(tmp_dir, str(index)), **kwargs)
+            duration = perf_counter() - start
+        print(f'{label:<16} {duration:8.3f} s  {file_count / duration:10.0f} files/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000, help='number of files written per level')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='file size in bytes')
+    parser.add_argument('--directory', help='directory on the file system under test (default: system temp dir)')
+    args = parser.parse_args()
+    run(args.directory, args.files, args.size)
+
+
+if __name__ == '__main__':
+    main()
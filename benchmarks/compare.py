@@ -0,0 +1,71 @@
+'''
+Compares two result files of ``benchmarks/suite.py`` and flags regressions: cases that got slower, issue more
+syscalls or need more peak memory than the baseline by more than the threshold. Syscalls are only compared if both
+runs counted them the same way (``/proc/self/io`` read/write calls or all calls with ``--strace``). Exits with status 1
+if any regression was found, so it can be used as a CI gate.
+
+Usage::
+
+    python benchmarks/compare.py baseline.json current.json --threshold 10
+'''
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# compared metric -> True if larger values are worse
+METRICS = {
+    'seconds': True,
+    'syscalls': True,
+    'peak_memory': True,
+}
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[str], List[str]]:
+    '''
+    :param baseline: results of the baseline run (``results`` entry of the JSON report)
+    :param current: results of the current run
+    :param threshold: tolerated relative change in percent
+    :return: report lines and the names of the regressed cases
+    '''
+    lines, regressions = [], []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current or name not in baseline:
+            lines.append(f'{name:<40} only in {"baseline" if name in baseline else "current run"}')
+            continue
+        changes = []
+        for metric, larger_is_worse in METRICS.items():
+            old, new = baseline[name].get(metric), current[name].get(metric)
+            if not old or new is None:
+                continue
+            if metric == 'syscalls' and baseline[name].get('syscall_source') != current[name].get('syscall_source'):
+                changes.append('syscalls not comparable')
+                continue
+            change = (new - old) / old * 100
+            regressed = (change if larger_is_worse else -change) > threshold
+            changes.append(f'{metric} {change:+7.1f} %{" REGRESSION" if regressed else ""}')
+            if regressed and name not in regressions:
+                regressions.append(name)
+        lines.append(f'{name:<40} {"  ".join(changes)}')
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help='JSON report of the baseline run')
+    parser.add_argument('current', help='JSON report of the current run')
+    parser.add_argument('--threshold', type=float, default=10.0, help='tolerated slowdown / memory growth in percent')
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text())['results']
+    current = json.loads(Path(args.current).read_text())['results']
+    lines, regressions = compare_results(baseline, current, args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) above {args.threshold} %: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+'''
+Benchmark suite for the walking, reading, writing and copying hot paths. Every case runs on a synthetic tree (wide, deep,
+symlink heavy with broken links, many small files, few large files) and records the best wall clock time of all
+repetitions, the throughput, the number of syscalls and the peak Python heap usage (``tracemalloc``, measured in a
+separate untimed run).
+
+By default, syscalls are read/write calls from ``/proc/self/io`` (Linux only). They are only reported for cases doing
+reads and writes: walks spend their syscalls in ``stat`` and ``getdents``, which are not counted there. With
+``--strace``, every case additionally runs once in a child process under ``strace -c -f``, and all its syscalls are
+counted (minus those of the interpreter start), including ``stat`` and ``getdents`` of the walks.
+
+Usage::
+
+    python benchmarks/suite.py --output baseline.json
+    ... change something ...
+    python benchmarks/suite.py --output current.json
+    python benchmarks/compare.py baseline.json current.json
+    python benchmarks/suite.py --select rglob files_in_dir --strace  # count the syscalls of the walks
+
+Use ``--directory`` to place the trees on the file system under test and ``--scale`` to grow or shrink them.
+'''
+import argparse
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+import tracemalloc
+import zlib
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+
+from common_helper_files import (copy_file, copy_tree,  # noqa: E402
+                                 get_binary_from_file, get_files_in_dir,
+                                 iter_files_in_dir, read_in_chunks,
+                                 read_into_chunks, safe_rglob,
+                                 write_binary_to_file)
+from synthetic_tree import (create_deep_tree, create_files,  # noqa: E402
+                            create_symlink_tree, create_wide_tree)
+
+# benchmark function -> (processed items, processed bytes)
+Measurement = Tuple[int, int]
+
+
+class BenchmarkCase(NamedTuple):
+    name: str
+    tree: str
+    function: Callable[[Path], Measurement]
+    io_syscalls: bool = True  # the read/write counts of /proc/self/io cover the work of the case
+
+
+class Trees:
+    '''
+    Creates the synthetic trees below ``root`` on first use.
+    '''
+
+    def __init__(self, root: Path, scale: float):
+        self.root = root
+        self.scale = scale
+        self._created = {}
+
+    def get(self, name: str) -> Path:
+        if name not in self._created:
+            path = self.root / name
+            getattr(self, f'_create_{name}')(path)
+            self._created[name] = path
+        return self._created[name]
+
+    def _count(self, count: int) -> int:
+        return max(1, int(count * self.scale))
+
+    def _create_wide(self, path: Path):
+        create_wide_tree(path, self._count(50000), files_per_dir=500)
+
+    def _create_deep(self, path: Path):
+        create_deep_tree(path, self._count(500), files_per_dir=10)
+
+    def _create_symlinks(self, path: Path):
+        create_symlink_tree(path, self._count(10000))
+
+    def _create_small_files(self, path: Path):
+        create_files(path, self._count(5000), 4 * 1024)
+
+    def _create_large_files(self, path: Path):
+        create_files(path, 4, self._count(64) * 1024 ** 2)
+
+    def _create_output(self, path: Path):
+        path.mkdir()
+
+
+def _walk(generator) -> Measurement:
+    return sum(1 for _ in generator), 0
+
+
+def _read_files(directory: Path, **kwargs) -> Measurement:
+    paths = sorted(directory.iterdir())
+    return len(paths), sum(len(get_binary_from_file(path, **kwargs)) for path in paths)
+
+
+def _read_chunks(directory: Path, chunk_generator: Callable) -> Measurement:
+    paths = sorted(directory.iterdir())
+    size = 0
+    for path in paths:
+        checksum = 0
+        with path.open('rb') as file_object:
+            for chunk in chunk_generator(file_object):
+                checksum = zlib.crc32(chunk, checksum)
+                size += len(chunk)
+    return len(paths), size
+
+
+def _write_files(directory: Path, count: int = 2000, size: int = 4 * 1024, **kwargs) -> Measurement:
+    content = bytes(size)
+    for index in range(count):
+        write_binary_to_file(content, directory / f'file_{index}', overwrite=True, **kwargs)
+    return count, count * size
+
+
+def _copy_files(directory: Path, copy: Callable[[Path, Path], None]) -> Measurement:
+    paths = sorted(directory.iterdir())
+    target = directory.with_name(f'{directory.name}_copy')
+    for path in paths:
+        copy(path, target / path.name)
+    return len(paths), sum(path.stat().st_size for path in paths)
+
+
+def _copy_through_user_space(src_path: Path, dst_path: Path):
+    write_binary_to_file(get_binary_from_file(src_path), dst_path, overwrite=True)
+
+
+def _copy_tree(directory: Path) -> Measurement:
+    summary = copy_tree(directory, directory.with_name(f'{directory.name}_tree_copy'), overwrite=True)
+    return summary.copied, 0
+
+
+CASES = [
+    BenchmarkCase('safe_rglob[wide]', 'wide', lambda path: _walk(safe_rglob(path)), io_syscalls=False),
+    BenchmarkCase('safe_rglob[deep]', 'deep', lambda path: _walk(safe_rglob(path)), io_syscalls=False),
+    BenchmarkCase('safe_rglob[symlinks]', 'symlinks', lambda path: _walk(safe_rglob(path, include_symlinks=True)), io_syscalls=False),
+    BenchmarkCase('get_files_in_dir[wide]', 'wide', lambda path: _walk(get_files_in_dir(str(path))), io_syscalls=False),
+    BenchmarkCase('get_files_in_dir[wide,workers=8]', 'wide', lambda path: _walk(get_files_in_dir(str(path), workers=8)), io_syscalls=False),
+    BenchmarkCase('get_files_in_dir[deep]', 'deep', lambda path: _walk(get_files_in_dir(str(path))), io_syscalls=False),
+    BenchmarkCase('iter_files_in_dir[wide,include]', 'wide', lambda path: _walk(iter_files_in_dir(path, include=['*_1*'])), io_syscalls=False),
+    BenchmarkCase('get_binary_from_file[small]', 'small_files', _read_files),
+    BenchmarkCase('get_binary_from_file[large]', 'large_files', _read_files),
+    BenchmarkCase('get_binary_from_file[large,memory_map]', 'large_files', lambda path: _read_files(path, memory_map=True)),
+    BenchmarkCase('read_in_chunks[large]', 'large_files', lambda path: _read_chunks(path, read_in_chunks)),
+    BenchmarkCase('read_into_chunks[large]', 'large_files', lambda path: _read_chunks(path, read_into_chunks)),
+    BenchmarkCase('write_binary_to_file[small]', 'output', _write_files),
+    BenchmarkCase('write_binary_to_file[small,atomic]', 'output', lambda path: _write_files(path, atomic=True)),
+    BenchmarkCase('read_and_write[large]', 'large_files', lambda path: _copy_files(path, _copy_through_user_space)),
+    BenchmarkCase('copy_file[large]', 'large_files', lambda path: _copy_files(path, lambda src, dst: copy_file(src, dst, overwrite=True))),
+    BenchmarkCase('copy_tree[small]', 'small_files', _copy_tree),
+]
+
+
+def get_syscall_count() -> Optional[int]:
+    '''
+    :return: read and write syscalls of this process so far; ``None`` if ``/proc/self/io`` is not available
+    '''
+    try:
+        counters = dict(line.split(': ') for line in Path('/proc/self/io').read_text().splitlines())
+        return int(counters['syscr']) + int(counters['syscw'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def count_syscalls_with_strace(strace: str, case: BenchmarkCase, path: Path) -> Optional[Dict[str, int]]:
+    '''
+    Runs the case once in a child process under ``strace -c -f``. The syscalls of the interpreter start and the imports
+    are measured in a child process that skips the case and subtracted.
+
+    :return: number of calls per syscall; ``None`` if strace failed
+    '''
+    counts = []
+    for arguments in (['--run-case', case.name, '--tree', str(path)], ['--run-case', case.name]):
+        with TemporaryDirectory(prefix='benchmark_strace') as tmp_dir:
+            output = Path(tmp_dir, 'strace.txt')
+            command = [strace, '-c', '-f', '-o', str(output), sys.executable, str(Path(__file__).absolute()), *arguments]
+            if subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                return None
+            counts.append(parse_strace_summary(output.read_text()))
+    case_counts, startup_counts = counts
+    return {name: count - startup_counts.get(name, 0) for name, count in case_counts.items() if count > startup_counts.get(name, 0)}
+
+
+def parse_strace_summary(text: str) -> Dict[str, int]:
+    '''
+    :param text: output of ``strace -c``: ``% time, seconds, usecs/call, calls, [errors,] syscall`` per row
+    :return: number of calls per syscall
+    '''
+    counts = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) in (5, 6) and fields[3].isdigit() and fields[-1] != 'total':
+            counts[fields[-1]] = int(fields[3])
+    return counts
+
+
+def run_case(case: BenchmarkCase, path: Path, repetitions: int, strace: Optional[str] = None) -> Dict:
+    durations, syscalls = [], []
+    for _ in range(repetitions):
+        syscalls_before = get_syscall_count()
+        start = perf_counter()
+        items, size = case.function(path)
+        durations.append(perf_counter() - start)
+        syscalls_after = get_syscall_count()
+        if syscalls_before is not None and syscalls_after is not None:
+            syscalls.append(syscalls_after - syscalls_before)
+    tracemalloc.start()
+    try:
+        case.function(path)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = min(durations)
+    result = {
+        'seconds': seconds,
+        'items': items,
+        'bytes': size,
+        'items_per_second': items / seconds if seconds else 0.0,
+        'bytes_per_second': size / seconds if seconds else 0.0,
+        'syscalls': min(syscalls) if syscalls and case.io_syscalls else None,
+        'syscall_source': 'proc-io' if syscalls and case.io_syscalls else None,
+        'peak_memory': peak_memory,
+    }
+    syscalls_by_name = count_syscalls_with_strace(strace, case, path) if strace else None
+    if syscalls_by_name is not None:
+        result.update(syscalls=sum(syscalls_by_name.values()), syscall_source='strace', syscalls_by_name=syscalls_by_name)
+    return result
+
+
+def run_suite(root: Path, scale: float, repetitions: int, selected: Optional[List[str]] = None, strace: Optional[str] = None) -> Dict:
+    trees = Trees(root, scale)
+    results = {}
+    for case in CASES:
+        if selected and not any(pattern in case.name for pattern in selected):
+            continue
+        result = run_case(case, trees.get(case.tree), repetitions, strace)
+        print(
+            f'{case.name:<40} {result["seconds"]:8.3f} s  {result["items_per_second"]:12.0f} items/s  '
+            f'{result["bytes_per_second"] / 1024 ** 2:10.1f} MiB/s  {"-" if result["syscalls"] is None else result["syscalls"]:>8} syscalls  '
+            f'{result["peak_memory"] / 1024:10.0f} KiB peak',
+            flush=True,
+        )
+        results[case.name] = result
+    return {
+        'metadata': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'repetitions': repetitions,
+            'strace': bool(strace),
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='store the results as JSON (e.g. as new baseline)')
+    parser.add_argument('--directory', help='create the synthetic trees in this directory (default: system temp)')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale factor for the size of the synthetic trees')
+    parser.add_argument('--repetitions', type=int, default=3, help='timed runs per case, the best one is reported')
+    parser.add_argument('--select', nargs='+', help='only run cases whose name contains one of these strings')
+    parser.add_argument('--strace', action='store_true', help='count all syscalls of each case with strace')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)  # child process of --strace
+    parser.add_argument('--tree', help=argparse.SUPPRESS)  # tree of --run-case, the case is skipped without it
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)  # broken symlinks in the trees are logged as warnings
+
+    if args.run_case is not None:
+        case = next(case for case in CASES if case.name == args.run_case)
+        if args.tree:
+            case.function(Path(args.tree))
+        return
+    strace = shutil.which('strace') if args.strace else None
+    if args.strace and strace is None:
+        parser.error('strace not found')
+    with TemporaryDirectory(prefix='benchmark_common_helper_files', dir=args.directory) as tmp_dir:
+        report = run_suite(Path(tmp_dir), args.scale, args.repetitions, args.select, strace)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+'''
+Helpers generating synthetic directory trees for the benchmarks.
+'''
+import os
+from collections import deque
+from pathlib import Path
+from typing import List, Union
+
+
+def create_wide_tree(root: Union[str, Path], file_count: int, files_per_dir: int = 1000, dirs_per_dir: int = 10, file_size: int = 0) -> Path:
+    '''
+    Creates a balanced tree with ``file_count`` files, ``files_per_dir`` files in each directory and
+    ``dirs_per_dir`` sub-directories per directory.
+
+    :param root: directory the tree is created in
+    :param file_count: total number of files
+    :param files_per_dir: number of files in each directory
+    :param dirs_per_dir: fan out of the directory tree
+    :param file_size: size of each file in bytes
+    :return: root of the tree
+    '''
+    root = Path(root)
+    content = os.urandom(file_size)
+    pending_dirs = deque([root])
+    created = 0
+    while created < file_count:
+        directory = pending_dirs.popleft()
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(min(files_per_dir, file_count - created)):
+            (directory / f'file_{index}').write_bytes(content)
+        created += min(files_per_dir, file_count - created)
+        pending_dirs.extend(directory / f'dir_{index}' for index in range(dirs_per_dir))
+    return root
+
+
+def create_deep_tree(root: Union[str, Path], depth: int, files_per_dir: int = 1, file_size: int = 0) -> Path:
+    '''
+    Creates a chain of ``depth`` nested directories with ``files_per_dir`` files in each of them.
+    '''
+    root = Path(root)
+    content = os.urandom(file_size)
+    directory = root
+    for level in range(depth):
+        directory.mkdir(parents=True, exist_ok=True)
+        for index in range(files_per_dir):
+            (directory / f'file_{index}').write_bytes(content)
+        directory = directory / f'level_{level}'
+    return root
+
+
+def create_symlink_tree(root: Union[str, Path], link_count: int, broken_ratio: float = 0.25) -> Path:
+    '''
+    Creates a directory with ``link_count`` symlinks: to files, to directories and (``broken_ratio``) broken ones,
+    including self-referencing links.
+    '''
+    root = Path(root)
+    targets = root / 'targets'
+    (targets / 'directory').mkdir(parents=True, exist_ok=True)
+    (targets / 'file').write_bytes(b'target')
+    links = root / 'links'
+    links.mkdir(exist_ok=True)
+    broken_count = int(link_count * broken_ratio)
+    for index in range(link_count):
+        link = links / f'link_{index}'
+        if index < broken_count // 2:
+            link.symlink_to(f'link_{index}')
+        elif index < broken_count:
+            link.symlink_to('none_existing')
+        else:
+            link.symlink_to(targets / ('file' if index % 2 else 'directory'))
+    return root
+
+
+def create_files(root: Union[str, Path], file_count: int, file_size: int) -> List[Path]:
+    '''
+    Creates ``file_count`` files of ``file_size`` random bytes in a single directory.
+    '''
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(file_count):
+        path = root / f'file_{index}'
+        with path.open('wb') as file_object:
+            remaining = file_size
+            while remaining > 0:
+                block = os.urandom(min(remaining, 1024 ** 2))
+                file_object.write(block)
+                remaining -= len(block)
+        paths.append(path)
+    return paths
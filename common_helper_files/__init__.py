@@ -1,27 +1,104 @@
-from .fail_safe_file_operations import (create_symlink, delete_file,
-                                        get_binary_from_file, get_dir_of_file,
-                                        get_dirs_in_dir, get_files_in_dir,
-                                        get_safe_name,
-                                        get_string_list_from_file, safe_rglob,
-                                        write_binary_to_file)
-from .file_functions import (create_dir_for_file, get_directory_for_filename,
-                             human_readable_file_size, read_in_chunks)
-from .git_functions import get_version_string_from_git
-
-__all__ = [
-    'create_dir_for_file',
-    'create_symlink',
-    'delete_file',
-    'get_binary_from_file',
-    'get_dir_of_file',
-    'get_directory_for_filename',
-    'get_dirs_in_dir',
-    'get_files_in_dir',
-    'get_safe_name',
-    'get_string_list_from_file',
-    'get_version_string_from_git',
-    'human_readable_file_size',
-    'read_in_chunks',
-    'safe_rglob',
-    'write_binary_to_file',
-]
+'''
+The public API is loaded lazily (PEP 562): ``import common_helper_files`` only imports this module, a submodule is
+imported the first time one of its names is accessed.
+'''
+import importlib
+
+TYPE_CHECKING = False  # same as typing.TYPE_CHECKING without importing typing at startup
+if TYPE_CHECKING:  # pragma: no cover
+    from .bulk_file_operations import (CopySummary, DeleteSummary,
+                                       SymlinkSummary, copy_tree,
+                                       create_symlinks, delete_files,
+                                       delete_tree, get_binaries_from_files)
+    from .fail_safe_file_operations import (copy_file, create_symlink,
+                                            delete_file,
+                                            get_binary_from_file,
+                                            get_dir_of_file, get_dirs_in_dir,
+                                            get_file_digest, get_files_in_dir,
+                                            get_safe_name, get_safe_names,
+                                            get_string_list_from_file,
+                                            iter_dirs_in_dir,
+                                            iter_files_in_dir,
+                                            iter_lines_from_file, safe_rglob,
+                                            safe_scandir, write_binary_to_file)
+    from .duplicate_files import (DuplicateGroup, find_duplicate_files,
+                                  link_duplicates)
+    from .file_cache import FileCache
+    from .file_functions import (create_dir_for_file,
+                                 get_directory_for_filename,
+                                 human_readable_file_size, read_in_chunks,
+                                 read_into_chunks)
+    from .git_functions import get_version_string_from_git, write_version_file
+    from .snapshot import (FileSystemSnapshot, diff_snapshots, take_snapshot,
+                           update_snapshot)
+    from .tree_map import FileResult, map_files, map_files_in_dir
+
+# public name -> submodule defining it
+_EXPORTS = {
+    'CopySummary': 'bulk_file_operations',
+    'DeleteSummary': 'bulk_file_operations',
+    'DuplicateGroup': 'duplicate_files',
+    'FileCache': 'file_cache',
+    'FileResult': 'tree_map',
+    'FileSystemSnapshot': 'snapshot',
+    'SymlinkSummary': 'bulk_file_operations',
+    'copy_file': 'fail_safe_file_operations',
+    'copy_tree': 'bulk_file_operations',
+    'create_dir_for_file': 'file_functions',
+    'create_symlink': 'fail_safe_file_operations',
+    'create_symlinks': 'bulk_file_operations',
+    'delete_file': 'fail_safe_file_operations',
+    'delete_files': 'bulk_file_operations',
+    'delete_tree': 'bulk_file_operations',
+    'diff_snapshots': 'snapshot',
+    'find_duplicate_files': 'duplicate_files',
+    'get_binaries_from_files': 'bulk_file_operations',
+    'get_binary_from_file': 'fail_safe_file_operations',
+    'get_dir_of_file': 'fail_safe_file_operations',
+    'get_directory_for_filename': 'file_functions',
+    'get_dirs_in_dir': 'fail_safe_file_operations',
+    'get_file_digest': 'fail_safe_file_operations',
+    'get_files_in_dir': 'fail_safe_file_operations',
+    'get_safe_name': 'fail_safe_file_operations',
+    'get_safe_names': 'fail_safe_file_operations',
+    'get_string_list_from_file': 'fail_safe_file_operations',
+    'get_version_string_from_git': 'git_functions',
+    'human_readable_file_size': 'file_functions',
+    'iter_dirs_in_dir': 'fail_safe_file_operations',
+    'iter_files_in_dir': 'fail_safe_file_operations',
+    'iter_lines_from_file': 'fail_safe_file_operations',
+    'link_duplicates': 'duplicate_files',
+    'map_files': 'tree_map',
+    'map_files_in_dir': 'tree_map',
+    'read_in_chunks': 'file_functions',
+    'read_into_chunks': 'file_functions',
+    'safe_rglob': 'fail_safe_file_operations',
+    'safe_scandir': 'fail_safe_file_operations',
+    'take_snapshot': 'snapshot',
+    'update_snapshot': 'snapshot',
+    'write_binary_to_file': 'fail_safe_file_operations',
+    'write_version_file': 'git_functions',
+}
+
+# submodules, bound as package attributes by the former eager imports (``common_helper_files.file_functions``)
+_SUBMODULES = (
+    'aio', 'bulk_file_operations', 'duplicate_files', 'fail_safe_file_operations', 'file_cache', 'file_functions',
+    'git_functions', 'metrics', 'snapshot', 'tree_map',
+)
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)  # the import binds the package attribute
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value  # later lookups do not reach __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
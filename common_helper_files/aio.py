@@ -0,0 +1,122 @@
+'''
+asyncio counterparts of the fail-safe file operations. Blocking calls are offloaded to a shared, size-limited thread
+pool, so they do not block the event loop. Results, error logging and exceptions match the synchronous functions::
+
+    from common_helper_files import aio
+
+    binary = await aio.get_binary_from_file('some_file')
+    async for path in aio.safe_rglob(Path('some_dir')):
+        ...
+'''
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator, List, Optional, TypeVar, Union
+from weakref import WeakKeyDictionary
+
+from . import fail_safe_file_operations as _sync
+
+DEFAULT_MAX_WORKERS = 32
+
+_T = TypeVar('_T')
+_max_workers = DEFAULT_MAX_WORKERS
+_executor = None  # type: Optional[ThreadPoolExecutor]
+_executor_lock = threading.Lock()
+_semaphores = WeakKeyDictionary()  # type: WeakKeyDictionary
+
+
+def set_max_workers(max_workers: int) -> None:
+    '''
+    Sets the size of the shared thread pool and the maximum number of concurrently offloaded calls per event loop.
+    A running pool is shut down after finishing its pending calls and replaced on the next call.
+
+    :param max_workers: maximum number of threads
+    '''
+    global _executor, _max_workers
+    with _executor_lock:
+        old_executor, _executor, _max_workers = _executor, None, max_workers
+        _semaphores.clear()
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix='common_helper_files_aio')
+        return _executor
+
+
+def _get_semaphore(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    # semaphores are bound to an event loop on python < 3.10
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_workers)
+    return semaphore
+
+
+async def _run(function: Callable[..., _T], *args, **kwargs) -> _T:
+    loop = asyncio.get_running_loop()
+    async with _get_semaphore(loop):
+        return await loop.run_in_executor(_get_executor(), functools.partial(function, *args, **kwargs))
+
+
+async def get_binary_from_file(file_path: Union[str, Path], memory_map: bool = False) -> Union[str, bytes]:
+    '''
+    async variant of :func:`common_helper_files.get_binary_from_file`
+    '''
+    return await _run(_sync.get_binary_from_file, file_path, memory_map=memory_map)
+
+
+async def write_binary_to_file(file_binary: Union[str, bytes], file_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False, atomic: bool = False, fsync: bool = False) -> None:
+    '''
+    async variant of :func:`common_helper_files.write_binary_to_file`
+    '''
+    await _run(_sync.write_binary_to_file, file_binary, file_path, overwrite=overwrite, file_copy=file_copy, atomic=atomic, fsync=fsync)
+
+
+async def delete_file(file_path: Union[str, Path]) -> None:
+    '''
+    async variant of :func:`common_helper_files.delete_file`
+    '''
+    await _run(_sync.delete_file, file_path)
+
+
+async def create_symlink(src_path: Union[str, Path], dst_path: Union[str, Path]) -> None:
+    '''
+    async variant of :func:`common_helper_files.create_symlink`
+    '''
+    await _run(_sync.create_symlink, src_path, dst_path)
+
+
+async def get_files_in_dir(directory_path: Union[str, Path], workers: int = 1, ordered: bool = True, max_open_dirs: Optional[int] = None) -> List[str]:
+    '''
+    async variant of :func:`common_helper_files.get_files_in_dir`
+    '''
+    return await _run(_sync.get_files_in_dir, directory_path, workers=workers, ordered=ordered, max_open_dirs=max_open_dirs)
+
+
+async def safe_rglob(path: Path, include_symlinks: bool = True, include_directories: bool = True, batch_size: int = 256) -> AsyncIterator[Path]:
+    '''
+    async iterator variant of :func:`common_helper_files.safe_rglob`. The walk is advanced in the thread pool,
+    ``batch_size`` paths at a time.
+    '''
+    iterator = _sync.safe_rglob(path, include_symlinks=include_symlinks, include_directories=include_directories)
+    while True:
+        batch = await _run(_get_next_batch, iterator, batch_size)
+        if not batch:
+            return
+        for item in batch:
+            yield item
+
+
+def _get_next_batch(iterator: Iterator[_T], batch_size: int) -> List[_T]:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            break
+    return batch
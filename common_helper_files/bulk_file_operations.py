@@ -0,0 +1,505 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from . import metrics
+from .fail_safe_file_operations import copy_file_or_raise, get_binary_from_file
+
+
+def get_binaries_from_files(file_paths: Iterable[Union[str, Path]], workers: int = 8, ordered: bool = True, max_in_flight_bytes: int = 64 * 1024 * 1024) -> Iterator[Tuple[Union[str, Path], Union[str, bytes]]]:
+    '''
+    Fail-safe batch variant of :func:`get_binary_from_file`. Files are read ahead on a thread pool so that the
+    I/O latency of the individual reads overlaps. The size of each file is reserved from ``max_in_flight_bytes`` when
+    its read is submitted and released when it is yielded, so running reads count as well. A file larger than the
+    budget is only read once nothing else is pending.
+    Errors are logged and the affected files are yielded with an empty byte string. No exception raised.
+
+    :param file_paths: paths of the files. Can be absolute or relative to the current directory.
+    :param workers: number of reader threads
+    :default workers: 8
+    :param ordered: yield results in input order. Otherwise they are yielded as soon as they are read.
+    :default ordered: True
+    :param max_in_flight_bytes: budget for submitted but not yet consumed file contents
+    :default max_in_flight_bytes: 64 MiB
+    :return: generator of ``(path, binary)`` tuples
+    '''
+    paths = iter(file_paths)
+    max_pending = 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        reserved_bytes = 0
+        next_path = None  # next path and its size, waiting for budget
+        while True:
+            while len(pending) < max_pending:
+                if next_path is None:
+                    file_path = next(paths, None)
+                    if file_path is None:
+                        break
+                    next_path = (file_path, _get_reserved_size(file_path))
+                file_path, size = next_path
+                if pending and reserved_bytes + size > max_in_flight_bytes:
+                    break
+                pending.append((file_path, executor.submit(get_binary_from_file, file_path), size))
+                reserved_bytes += size
+                next_path = None
+            if not pending:
+                break
+            if ordered:
+                item = pending.popleft()
+            else:
+                wait([future for _, future, _ in pending], return_when=FIRST_COMPLETED)
+                item = next(item for item in pending if item[1].done())
+                pending.remove(item)
+            file_path, future, size = item
+            reserved_bytes -= size
+            yield file_path, future.result()
+
+
+def _get_reserved_size(file_path: Union[str, Path]) -> int:
+    try:
+        return os.lstat(file_path).st_size  # symlinks: length of the target, which is what is read
+    except OSError:
+        return 0  # the read reports the error
+
+
+def _get_entry_count(summary, *_) -> int:
+    # bulk operations record one event per call with the number of processed entries as size
+    return summary[0] + summary.failed + len(getattr(summary, 'existing', ()))
+
+
+def _get_errors(summary) -> Dict[str, int]:
+    return summary.errors
+
+
+class DeleteSummary(NamedTuple):
+    deleted: int
+    failed: int
+    errors: Dict[str, int]  # number of failures per exception type
+
+
+@metrics.instrumented('delete', get_size=_get_entry_count, get_errors=_get_errors)
+def delete_files(file_paths: Iterable[Union[str, Path]], workers: int = 8, batch_size: int = 1024) -> DeleteSummary:
+    '''
+    Fail-safe bulk variant of :func:`delete_file`. The paths are grouped by directory and each directory is opened
+    only once: the files are removed with ``os.unlink`` relative to the directory descriptor on a thread pool.
+    Instead of logging every failure, a single warning summarizes them. No exception raised.
+
+    :param file_paths: paths of the files. Can be absolute or relative to the current directory.
+    :param workers: number of threads
+    :default workers: 8
+    :param batch_size: number of paths grouped at once
+    :return: number of deleted files, number of failures and failures per exception type
+    '''
+    statistics = _BulkStatistics()
+    task_slots = threading.BoundedSemaphore(2 * workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in _get_batches(file_paths, batch_size):
+            names_by_directory = defaultdict(list)
+            for file_path in batch:
+                directory, name = os.path.split(os.fspath(file_path))
+                names_by_directory[directory].append(name)
+            for directory, names in names_by_directory.items():
+                task_slots.acquire()
+                future = executor.submit(_unlink_in_directory, directory, names, statistics)
+                future.add_done_callback(lambda _: task_slots.release())
+    return statistics.get_summary('delete files')
+
+
+@metrics.instrumented('delete', get_size=_get_entry_count, get_errors=_get_errors)
+def delete_tree(directory_path: Union[str, Path], workers: int = 8, remove_root: bool = True) -> DeleteSummary:
+    '''
+    Fail-safe parallel alternative to ``shutil.rmtree``. Directories are opened relative to their parent's descriptor
+    without following symlinks, so the removal never leaves the tree, even if it is modified concurrently. Files are
+    unlinked on a thread pool and directories are removed bottom-up once they are empty.
+    Instead of logging every failure, a single warning summarizes them. No exception raised.
+
+    :param directory_path: root of the tree. Symlinks are not followed, not even for the root.
+    :param workers: number of threads
+    :default workers: 8
+    :param remove_root: also remove ``directory_path`` itself
+    :default remove_root: True
+    :return: number of deleted entries (files and directories), number of failures and failures per exception type
+    '''
+    statistics = _BulkStatistics()
+    if not {os.open, os.unlink, os.rmdir} <= os.supports_dir_fd or os.scandir not in os.supports_fd:
+        _delete_tree_without_dir_fd(directory_path, remove_root, statistics)
+        return statistics.get_summary('delete tree')
+    try:
+        root_descriptor = os.open(os.fspath(directory_path), _OPEN_DIRECTORY_FLAGS)
+    except OSError as exc:
+        statistics.add_failure(exc)
+        return statistics.get_summary('delete tree')
+    root = _DirectoryNode(root_descriptor, os.fspath(directory_path), None)
+    _TreeRemover(workers, statistics, remove_root).run(root)
+    return statistics.get_summary('delete tree')
+
+
+class SymlinkSummary(NamedTuple):
+    created: int
+    existing: List[str]  # link locations that already existed
+    failed: int
+    errors: Dict[str, int]  # number of failures per exception type
+
+
+@metrics.instrumented('symlink', get_size=_get_entry_count, get_errors=_get_errors)
+def create_symlinks(path_pairs: Iterable[Tuple[Union[str, Path], Union[str, Path]]], workers: int = 8, relative: bool = False, batch_size: int = 1024) -> SymlinkSummary:
+    '''
+    Fail-safe bulk variant of :func:`create_symlink`. Missing parent directories are created once and remembered,
+    so each link costs roughly one ``symlink`` call, which runs on a thread pool. Existing link locations are not
+    touched but reported. Instead of logging every failure, a single warning summarizes them. No exception raised.
+
+    :param path_pairs: ``(src_path, dst_path)`` tuples: link location dst_path pointing to src_path
+    :param workers: number of threads
+    :default workers: 8
+    :param relative: create links relative to the link location
+    :default relative: False
+    :param batch_size: number of links created per task
+    :return: number of created links, already existing link locations, number of failures and failures per exception type
+    '''
+    statistics = _BulkStatistics()
+    existing_directories = set()
+    task_slots = threading.BoundedSemaphore(2 * workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in _get_batches(path_pairs, batch_size):
+            links = []
+            for src_path, dst_path in batch:
+                try:
+                    link = _prepare_symlink(os.fspath(src_path), os.fspath(dst_path), relative, existing_directories)
+                except OSError as exc:
+                    statistics.add_failure(exc)
+                    continue
+                links.append(link)
+            task_slots.acquire()
+            future = executor.submit(_create_symlinks, links, statistics)
+            future.add_done_callback(lambda _: task_slots.release())
+    return statistics.get_symlink_summary()
+
+
+def _prepare_symlink(src_path: str, dst_path: str, relative: bool, existing_directories: set) -> Tuple[str, str]:
+    directory = os.path.dirname(os.path.abspath(dst_path))
+    if directory not in existing_directories:
+        os.makedirs(directory, exist_ok=True)
+        existing_directories.add(directory)
+    if relative:
+        src_path = os.path.relpath(os.path.abspath(src_path), directory)
+    return src_path, dst_path
+
+
+def _create_symlinks(links: List[Tuple[str, str]], statistics: '_BulkStatistics') -> None:
+    for src_path, dst_path in links:
+        try:
+            os.symlink(src_path, dst_path)
+            statistics.add_success()
+        except FileExistsError:
+            statistics.add_existing(dst_path)
+        except OSError as exc:
+            statistics.add_failure(exc)
+
+
+class CopySummary(NamedTuple):
+    copied: int
+    existing: List[str]  # destination files that already existed and were kept
+    failed: int
+    errors: Dict[str, int]  # number of failures per exception type
+
+
+@metrics.instrumented('copy', get_size=_get_entry_count, get_errors=_get_errors)
+def copy_tree(src_path: Union[str, Path], dst_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False, metadata: bool = True, workers: int = 8, batch_size: int = 256) -> CopySummary:
+    '''
+    Fail-safe bulk variant of :func:`copy_file` for a directory tree. The tree is walked while the files are copied
+    on a thread pool. Symbolic links (including broken ones) are copied as links, holes of sparse files are
+    preserved. Directory metadata is applied once all files are copied. Existing destination files are handled as by
+    :func:`copy_file` and reported if kept. Instead of logging every failure, a single warning summarizes them.
+    Raises a ``ValueError`` if ``overwrite`` and ``file_copy`` are both ``True``.
+
+    :param src_path: root of the tree
+    :param dst_path: root of the copy. Created if needed. It is not copied into itself if it lies inside src_path.
+    :param overwrite: overwrite existing files
+    :default overwrite: False
+    :param file_copy: copy to a new file with a counter added to the file name if a file already exists
+    :default file_copy: False
+    :param metadata: copy permission bits and access and modification times
+    :default metadata: True
+    :param workers: number of threads
+    :default workers: 8
+    :param batch_size: number of files copied per task
+    :return: number of copied files, kept destination files, number of failures and failures per exception type
+    '''
+    if overwrite and file_copy:
+        raise ValueError("The arguments overwrite and file_copy cannot both be true.")
+
+    statistics = _BulkStatistics()
+    copied_directories = []
+    task_slots = threading.BoundedSemaphore(2 * workers)
+    dst_root = os.path.realpath(dst_path)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        stack = [(os.fspath(src_path), os.fspath(dst_path))]
+        while stack:
+            src_directory, dst_directory = stack.pop()
+            try:
+                src_stat = os.stat(src_directory)
+                os.makedirs(dst_directory, exist_ok=True)
+            except OSError as exc:
+                statistics.add_failure(exc)
+                continue
+            copied_directories.append((dst_directory, src_stat))
+            files = []
+            try:
+                with os.scandir(src_directory) as entries:
+                    for entry in entries:
+                        dst_entry = os.path.join(dst_directory, entry.name)
+                        try:
+                            is_directory = entry.is_dir(follow_symlinks=False)
+                        except OSError as exc:
+                            statistics.add_failure(exc)
+                            continue
+                        if not is_directory:
+                            files.append((entry.path, dst_entry))
+                        elif os.path.realpath(entry.path) != dst_root:
+                            stack.append((entry.path, dst_entry))
+            except OSError as exc:  # the files listed so far are still copied
+                statistics.add_failure(exc)
+            for batch in _get_batches(files, batch_size):
+                task_slots.acquire()
+                future = executor.submit(_copy_files, batch, overwrite, file_copy, metadata, statistics)
+                future.add_done_callback(lambda _: task_slots.release())
+    if metadata:
+        for directory, src_stat in reversed(copied_directories):  # children first: copying them changed the times
+            _copy_directory_metadata(directory, src_stat, statistics)
+    return statistics.get_copy_summary()
+
+
+def _copy_files(path_pairs: List[Tuple[str, str]], overwrite: bool, file_copy: bool, metadata: bool, statistics: '_BulkStatistics') -> None:
+    for src_path, dst_path in path_pairs:
+        try:
+            if copy_file_or_raise(src_path, dst_path, overwrite, file_copy, metadata=metadata) is None:
+                statistics.add_existing(dst_path)
+            else:
+                statistics.add_success()
+        except (OSError, ValueError) as exc:
+            statistics.add_failure(exc)
+
+
+def _copy_directory_metadata(directory: str, src_stat: os.stat_result, statistics: '_BulkStatistics') -> None:
+    try:
+        os.chmod(directory, src_stat.st_mode & 0o7777)
+        os.utime(directory, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    except OSError as exc:
+        statistics.add_failure(exc)
+
+
+_OPEN_DIRECTORY_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+
+
+class _BulkStatistics:
+    def __init__(self):
+        self.succeeded = 0
+        self.errors = Counter()
+        self.existing = []
+        self._lock = threading.Lock()
+
+    def add_success(self, count: int = 1) -> None:
+        with self._lock:
+            self.succeeded += count
+
+    def add_failure(self, exc: Exception, count: int = 1) -> None:
+        with self._lock:
+            self.errors[type(exc).__name__] += count
+
+    def add_existing(self, path: str) -> None:
+        with self._lock:
+            self.existing.append(path)
+
+    def get_summary(self, operation: str) -> DeleteSummary:
+        return DeleteSummary(self.succeeded, self._log_failures(operation), dict(self.errors))
+
+    def get_symlink_summary(self) -> SymlinkSummary:
+        return SymlinkSummary(self.succeeded, self.existing, self._log_failures('create links'), dict(self.errors))
+
+    def get_copy_summary(self) -> CopySummary:
+        return CopySummary(self.succeeded, self.existing, self._log_failures('copy files'), dict(self.errors))
+
+    def _log_failures(self, operation: str) -> int:
+        failed = sum(self.errors.values())
+        if failed:
+            logging.warning(f'Could not {operation}: {failed} failures ({dict(self.errors)}), {self.succeeded} succeeded')
+        return failed
+
+
+def _get_batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _unlink_in_directory(directory: str, names: List[str], statistics: _BulkStatistics) -> None:
+    try:
+        directory_descriptor = os.open(directory or os.curdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    except OSError as exc:
+        statistics.add_failure(exc, len(names))
+        return
+    try:
+        for name in names:
+            _unlink(name, directory_descriptor, statistics)
+    finally:
+        os.close(directory_descriptor)
+
+
+def _unlink(name: str, directory_descriptor: int, statistics: _BulkStatistics) -> bool:
+    try:
+        os.unlink(name, dir_fd=directory_descriptor)
+        statistics.add_success()
+        return True
+    except OSError as exc:
+        statistics.add_failure(exc)
+        return False
+
+
+class _DirectoryNode:
+    __slots__ = ('descriptor', 'name', 'parent', 'pending', 'listed', 'failed', 'lock')
+
+    def __init__(self, descriptor: Optional[int], name: str, parent: Optional['_DirectoryNode']):
+        self.descriptor = descriptor
+        self.name = name
+        self.parent = parent
+        self.pending = 1  # the listing of the directory itself
+        self.listed = True  # False if the listing failed, the content is unknown
+        self.failed = False  # an entry could not be removed, so the directory is not empty
+        self.lock = threading.Lock()
+
+
+class _TreeRemover:
+    '''
+    Removes a tree with a pool of worker threads. Tasks are processed last in, first out, i.e. depth-first, so only
+    the directories on the paths currently being processed are kept open.
+    '''
+
+    def __init__(self, workers: int, statistics: _BulkStatistics, remove_root: bool, unlink_batch_size: int = 1024):
+        self.workers = workers
+        self.statistics = statistics
+        self.remove_root = remove_root
+        self.unlink_batch_size = unlink_batch_size
+        self.tasks = queue.LifoQueue()
+
+    def run(self, root: _DirectoryNode) -> None:
+        threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self._submit(self._list_directory, root)
+        self.tasks.join()
+        for _ in threads:
+            self.tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _submit(self, function: Callable, *args) -> None:
+        self.tasks.put((function, args))
+
+    def _work(self) -> None:
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            function, args = task
+            try:
+                function(*args)
+            except Exception as exc:  # must never kill a worker, otherwise the removal would hang
+                logging.error(f'Unexpected error while deleting tree: {exc}', exc_info=True)
+            finally:
+                self.tasks.task_done()
+
+    def _list_directory(self, node: _DirectoryNode) -> None:
+        try:
+            if node.descriptor is None:
+                node.descriptor = os.open(node.name, _OPEN_DIRECTORY_FLAGS, dir_fd=node.parent.descriptor)
+            with os.scandir(node.descriptor) as iterator:
+                entries = list(iterator)
+        except OSError as exc:
+            self.statistics.add_failure(exc)
+            node.listed = False
+            self._complete(node)
+            return
+        files, sub_directories = [], []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            (sub_directories if is_dir else files).append(entry.name)
+        batches = list(_get_batches(files, self.unlink_batch_size))
+        with node.lock:
+            node.pending += len(batches) + len(sub_directories)
+        for batch in batches:
+            self._submit(self._unlink_files, node, batch)
+        for name in sub_directories:
+            self._submit(self._list_directory, _DirectoryNode(None, name, node))
+        self._complete(node)
+
+    def _unlink_files(self, node: _DirectoryNode, names: List[str]) -> None:
+        if not all([_unlink(name, node.descriptor, self.statistics) for name in names]):
+            self._mark_failed(node)
+        self._complete(node)
+
+    def _complete(self, node: Optional[_DirectoryNode]) -> None:
+        # removes the directory once all of its tasks are done and continues with its parent
+        while node is not None:
+            with node.lock:
+                node.pending -= 1
+                if node.pending > 0:
+                    return
+            if node.descriptor is not None:
+                os.close(node.descriptor)
+            if node.failed:  # not empty, the failure inside was already counted
+                self._mark_failed(node.parent)
+            elif node.parent is not None:
+                self._remove_directory(node, lambda: os.rmdir(node.name, dir_fd=node.parent.descriptor))
+            elif self.remove_root:
+                self._remove_directory(node, lambda: os.rmdir(node.name))
+            node = node.parent
+
+    def _remove_directory(self, node: _DirectoryNode, remove: Callable[[], None]) -> None:
+        try:
+            remove()
+            self.statistics.add_success()
+        except OSError as exc:
+            if node.listed:
+                self.statistics.add_failure(exc)
+            # else: the failed listing was counted, an unreadable directory is usually not empty
+            self._mark_failed(node.parent)
+
+    @staticmethod
+    def _mark_failed(node: Optional[_DirectoryNode]) -> None:
+        if node is not None:
+            with node.lock:
+                node.failed = True
+
+
+def _delete_tree_without_dir_fd(directory_path: Union[str, Path], remove_root: bool, statistics: _BulkStatistics) -> None:
+    def on_error(*args):
+        statistics.add_failure(args[2][1])
+
+    path = Path(directory_path)
+    if path.is_symlink():
+        statistics.add_failure(OSError('Cannot delete tree through a symbolic link'))
+        return
+    try:
+        children = [path] if remove_root else list(path.iterdir())
+    except OSError as exc:
+        statistics.add_failure(exc)
+        return
+    for child in children:
+        if child.is_dir() and not child.is_symlink():
+            shutil.rmtree(str(child), onerror=on_error)  # successfully removed entries are not counted here
+        else:
+            _unlink_in_directory(str(path), [child.name], statistics)
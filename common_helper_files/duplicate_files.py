@@ -0,0 +1,182 @@
+'''
+Staged search for files with identical content::
+
+    groups = find_duplicate_files('/some/extraction/root')
+    for group in groups:
+        print(group.size, group.paths)
+    link_duplicates(groups, link_type='hardlink')
+
+Files are grouped by size first. Only files sharing their size with another file are read: the first and the last
+block are hashed, and only files that still collide are hashed completely. Hard links (and, with
+``include_symlinks``, symlinks to files) refer to the same inode and are never reported as duplicates of each other.
+'''
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .fail_safe_file_operations import _create_temporary_file, create_symlink, get_file_digest, safe_scandir
+
+LINK_TYPES = ('hardlink', 'symlink')
+
+
+class DuplicateGroup(NamedTuple):
+    size: int
+    digest: str  # hex digest of the complete content
+    paths: List[str]  # one path per distinct file (inode), sorted
+
+
+class _Candidate(NamedTuple):
+    path: str  # path reported in the results
+    hash_path: str  # path of the file itself (resolved symlink)
+    size: int
+
+
+def find_duplicate_files(directory_path: Union[str, Path], include_symlinks: bool = False, workers: int = 8, algorithm: str = 'sha256', block_size: int = 64 * 1024, min_size: int = 1) -> List[DuplicateGroup]:
+    '''
+    Fail-safe search for files with identical content in a directory tree. The tree is walked with
+    :func:`safe_scandir`, files are hashed on a thread pool. Files with a unique size are never read, files with a
+    unique first and last block are never read completely.
+    Errors are logged and the affected files are skipped. No exception raised.
+
+    :param directory_path: root of the tree
+    :param include_symlinks: consider symlinks pointing to files (see :func:`safe_rglob`). Their targets are compared,
+        so a symlink is never a duplicate of its own target.
+    :default include_symlinks: False
+    :param workers: number of hashing threads
+    :default workers: 8
+    :param algorithm: name of a ``hashlib`` algorithm
+    :default algorithm: 'sha256'
+    :param block_size: size of the first and the last block hashed before hashing complete files
+    :default block_size: 64 KiB
+    :param min_size: smaller files are ignored
+    :default min_size: 1 (empty files are ignored)
+    :return: groups of at least two distinct files with identical content, largest files first
+    '''
+    candidates = [candidate for group in _group_by_size(directory_path, include_symlinks, min_size) if len(group) > 1 for candidate in group]
+    duplicates, to_hash = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        block_digests = executor.map(partial(_get_block_digest, algorithm=algorithm, block_size=block_size), candidates)
+        for (size, digest), group in _group(candidates, block_digests).items():
+            if size <= 2 * block_size:  # the blocks covered the complete file
+                duplicates.append(_create_duplicate_group(size, digest, group))
+            else:
+                to_hash.extend(group)
+        full_digests = executor.map(lambda candidate: get_file_digest(candidate.hash_path, algorithm), to_hash)
+        for (size, digest), group in _group(to_hash, full_digests).items():
+            duplicates.append(_create_duplicate_group(size, digest, group))
+    return sorted(duplicates, key=lambda group: (-group.size, group.paths))
+
+
+def link_duplicates(groups: Iterable[DuplicateGroup], link_type: str = 'hardlink', relative: bool = False) -> int:
+    '''
+    Fail-safe replacement of duplicates by links. In each group, the first path is kept and all other paths are
+    replaced by hard links or symlinks (created with :func:`create_symlink`) to it. Each replacement is atomic: the
+    link is created under a temporary name and renamed over the duplicate. Files whose size changed since the search
+    are skipped. Other hard links of a replaced file keep their content.
+    Errors are logged. No exception raised.
+
+    :param groups: result of :func:`find_duplicate_files`
+    :param link_type: ``'hardlink'`` or ``'symlink'``
+    :default link_type: 'hardlink'
+    :param relative: create symlinks relative to the link location
+    :default relative: False
+    :return: number of replaced files
+    '''
+    if link_type not in LINK_TYPES:
+        logging.error(f'Could not link duplicates: unknown link type {link_type}')
+        return 0
+    replaced = 0
+    for group in groups:
+        original = group.paths[0]
+        for duplicate in group.paths[1:]:
+            replaced += _replace_with_link(original, duplicate, group.size, link_type, relative)
+    return replaced
+
+
+def _group_by_size(directory_path: Union[str, Path], include_symlinks: bool, min_size: int) -> Iterable[List[_Candidate]]:
+    inodes = {}  # type: Dict[Tuple[int, int], _Candidate]
+    for entry in safe_scandir(directory_path, include_symlinks=include_symlinks, include_directories=False):
+        try:
+            entry_stat = entry.stat()
+            if entry.is_symlink():
+                if not entry.is_file():
+                    continue
+                hash_path = os.path.realpath(entry.path)
+            else:
+                hash_path = entry.path
+        except OSError as exc:
+            logging.warning(f'Could not stat {entry.path}: {exc}')
+            continue
+        if entry_stat.st_size < min_size:
+            continue
+        key = (entry_stat.st_dev, entry_stat.st_ino)
+        candidate = inodes.get(key)
+        # an inode is represented by its smallest path, preferring regular files over symlinks
+        if candidate is None or (hash_path != entry.path, entry.path) < (candidate.hash_path != candidate.path, candidate.path):
+            inodes[key] = _Candidate(entry.path, hash_path, entry_stat.st_size)
+    return _group(inodes.values(), (candidate.size for candidate in inodes.values()), keep_key=False).values()
+
+
+def _group(candidates: Iterable[_Candidate], keys: Iterable, keep_key: bool = True) -> Dict:
+    '''
+    :return: candidates grouped by ``(size, key)`` (or ``key`` for ``keep_key=False``); only groups of at least two
+        candidates, candidates without key (read errors) are dropped
+    '''
+    groups = {}
+    for candidate, key in zip(candidates, keys):
+        if key or key == 0:
+            groups.setdefault((candidate.size, key) if keep_key else key, []).append(candidate)
+    return {key: group for key, group in groups.items() if len(group) > 1}
+
+
+def _get_block_digest(candidate: _Candidate, algorithm: str, block_size: int) -> Optional[str]:
+    '''
+    :return: digest of the first and the last block; for files up to ``2 * block_size``, the digest of the complete
+        file (same as :func:`get_file_digest`); ``None`` on error
+    '''
+    try:
+        file_hash = hashlib.new(algorithm)
+        with open(candidate.hash_path, 'rb') as file_object:
+            file_hash.update(file_object.read(block_size))
+            if candidate.size > 2 * block_size:
+                file_object.seek(-block_size, os.SEEK_END)
+            file_hash.update(file_object.read(block_size))
+        return file_hash.hexdigest()
+    except (OSError, ValueError) as exc:
+        logging.warning(f'Could not hash {candidate.hash_path}: {exc}')
+        return None
+
+
+def _create_duplicate_group(size: int, digest: str, group: List[_Candidate]) -> DuplicateGroup:
+    return DuplicateGroup(size, digest, sorted(candidate.path for candidate in group))
+
+
+def _replace_with_link(original: str, duplicate: str, size: int, link_type: str, relative: bool) -> bool:
+    tmp_path = None
+    try:
+        if os.path.samefile(original, duplicate):
+            return False
+        if os.lstat(duplicate).st_size != size:
+            logging.warning(f'Could not link {duplicate}: changed since the search')
+            return False
+        tmp_path = _create_temporary_file(Path(duplicate))
+        os.unlink(str(tmp_path))
+        if link_type == 'hardlink':
+            os.link(original, str(tmp_path))
+        else:
+            target = os.path.relpath(os.path.abspath(original), os.path.dirname(os.path.abspath(duplicate))) if relative else original
+            create_symlink(target, tmp_path)
+            if not os.path.islink(str(tmp_path)):
+                return False
+        os.replace(str(tmp_path), duplicate)
+        return True
+    except OSError as exc:
+        logging.error(f'Could not link {duplicate} to {original}: {exc}', exc_info=True)
+        return False
+    finally:
+        if tmp_path is not None and os.path.lexists(str(tmp_path)):
+            os.unlink(str(tmp_path))
@@ -1,35 +1,144 @@
+import codecs
+import errno
+import fnmatch
+import hashlib
 import logging
+import mmap
 import os
 import re
+import stat
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Sequence, Tuple, Union
 
-from .file_functions import create_dir_for_file
+from . import metrics
+from .file_functions import create_dir_for_file, read_in_chunks, read_into_chunks
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-def get_binary_from_file(file_path: Union[str, Path]) -> Union[str, bytes]:
+PathFilter = Union[str, Pattern, Sequence[Union[str, Pattern]]]
+
+
+def _get_size(binary) -> int:
+    try:
+        return len(binary)
+    except TypeError:
+        return 0
+
+
+@metrics.instrumented('read', get_size=lambda result, args, kwargs: _get_size(result))
+def get_binary_from_file(file_path: Union[str, Path], memory_map: bool = False) -> Union[str, bytes, mmap.mmap]:
     '''
     Fail-safe file read operation. Symbolic links are converted to text files including the link.
     Errors are logged. No exception raised.
 
+    With ``memory_map`` set, regular files are mapped read-only into memory instead of being copied to the heap.
+    The returned ``mmap.mmap`` supports slicing, ``find`` and the buffer protocol (e.g. ``memoryview``) and should
+    be closed after use, e.g. by using it as context manager. Empty files and special files (pipes, devices, ...)
+    cannot be mapped and are read as usual. All results (including symbolic links and errors) then support
+    ``close()`` and the context manager protocol, so ``with get_binary_from_file(path, memory_map=True) as binary:``
+    works for every path.
+
     :param file_path: Path of the file. Can be absolute or relative to the current directory.
-    :return: file's binary as bytes; returns empty byte string on error
+    :param memory_map: map the file into memory instead of reading it
+    :default memory_map: False
+    :return: file's binary as bytes (or read-only memory map); returns empty byte string on error
     '''
     try:
         path = Path(file_path)
         if path.is_symlink():
-            # We need to wait for python 3.9 for Path.readlink
-            binary = f'symbolic link -> {os.readlink(path)}'
+            binary = _get_symlink_text(path)
+        elif memory_map:
+            binary = _map_file(path)
         else:
             binary = path.read_bytes()
     except Exception as e:
         logging.error(f'Could not read file: {e}', exc_info=True)
+        metrics.record_error('read', e)
         binary = b''
 
+    if memory_map and not isinstance(binary, mmap.mmap):
+        return _ClosableStr(binary) if isinstance(binary, str) else _ClosableBytes(binary)
     return binary
 
 
+def _get_symlink_text(path: Path) -> str:
+    # We need to wait for python 3.9 for Path.readlink
+    return f'symbolic link -> {os.readlink(path)}'
+
+
+def _map_file(path: Path) -> Union[bytes, mmap.mmap]:
+    with path.open('rb') as file_object:
+        file_stat = os.fstat(file_object.fileno())
+        if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size == 0:
+            return file_object.read()
+        return mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Closable:
+    # lets unmapped results of get_binary_from_file(memory_map=True) be closed like an mmap.mmap
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class _ClosableBytes(_Closable, bytes):
+    pass
+
+
+class _ClosableStr(_Closable, str):
+    pass
+
+
+def _get_path_size(result, args, kwargs) -> int:
+    # size of the read file, stat'ed only while metrics are recorded
+    try:
+        return os.lstat(kwargs.get('file_path', args[0] if args else None)).st_size if result else 0
+    except (OSError, TypeError):
+        return 0
+
+
+@metrics.instrumented('read', get_size=_get_path_size)
+def get_file_digest(file_path: Union[str, Path], algorithm: str = 'sha256', chunk_size: int = 1024 * 1024) -> str:
+    '''
+    Fail-safe file hash operation. The file is streamed in chunks, so it is never loaded completely.
+    Symbolic links are hashed like the text returned by :func:`get_binary_from_file`.
+    Errors are logged. No exception raised.
+
+    :param file_path: Path of the file. Can be absolute or relative to the current directory.
+    :param algorithm: name of a ``hashlib`` algorithm
+    :default algorithm: 'sha256'
+    :param chunk_size: number of bytes hashed at once
+    :return: hex digest of the file; returns empty string on error
+    '''
+    try:
+        file_hash = hashlib.new(algorithm)
+        path = Path(file_path)
+        if path.is_symlink():
+            file_hash.update(_get_symlink_text(path).encode('utf-8', 'surrogateescape'))
+        else:
+            with path.open('rb') as file_object:
+                for chunk in read_in_chunks(file_object, chunk_size=chunk_size):
+                    file_hash.update(chunk)
+        return file_hash.hexdigest()
+    except Exception as exc:
+        logging.error(f'Could not hash file: {exc}', exc_info=True)
+        metrics.record_error('read', exc)
+        return ''
+
+
 def get_string_list_from_file(file_path: Union[str, Path]) -> List[str]:
     '''
     Fail-safe file read operation returning a list of text strings.
@@ -44,7 +153,59 @@ def get_string_list_from_file(file_path: Union[str, Path]) -> List[str]:
     return cleaned_string.split('\n')
 
 
-def write_binary_to_file(file_binary: Union[str, bytes], file_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False) -> None:
+@metrics.instrumented_generator('read', get_size=lambda line: len(line) + 1)  # characters approximate the bytes
+def iter_lines_from_file(file_path: Union[str, Path], chunk_size: int = 64 * 1024, max_line_length: Optional[int] = None, max_lines: Optional[int] = None) -> Iterator[str]:
+    '''
+    Lazy variant of :func:`get_string_list_from_file`. The file is decoded incrementally and the lines are yielded
+    as they are found, so memory usage is bounded by the chunk size and the longest line (or ``max_line_length``).
+    Without limits, the lines are identical to the list returned by :func:`get_string_list_from_file`.
+    Errors are logged. No exception raised.
+
+    :param file_path: Path of the file. Can be absolute or relative to the current directory.
+    :param chunk_size: number of bytes read at once
+    :param max_line_length: truncate lines to this number of characters
+    :param max_lines: stop after this number of lines
+    :return: generator of the file's lines
+    '''
+    if max_lines is not None and max_lines <= 0:
+        return
+    line_count = 0
+    pending_parts, pending_length = [], 0
+    try:
+        for text in _iter_decoded_chunks(file_path, chunk_size):
+            lines = text.replace('\r', '').split('\n')
+            for line in lines[:-1]:
+                pending_parts.append(line)
+                line = ''.join(pending_parts)
+                yield line if max_line_length is None else line[:max_line_length]
+                line_count += 1
+                if line_count == max_lines:
+                    return
+                pending_parts, pending_length = [], 0
+            if max_line_length is None or pending_length < max_line_length:
+                pending_parts.append(lines[-1])
+                pending_length += len(lines[-1])
+    except Exception as exc:
+        logging.error(f'Could not read file: {exc}', exc_info=True)
+        metrics.record_error('read', exc)
+    line = ''.join(pending_parts)
+    yield line if max_line_length is None else line[:max_line_length]
+
+
+def _iter_decoded_chunks(file_path: Union[str, Path], chunk_size: int) -> Iterator[str]:
+    path = Path(file_path)
+    if path.is_symlink():
+        yield _get_symlink_text(path)
+        return
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with path.open('rb') as file_object:
+        for chunk in read_into_chunks(file_object, chunk_size=chunk_size):
+            yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+@metrics.instrumented('write', get_size=lambda result, args, kwargs: _get_size(kwargs.get('file_binary', args[0] if args else None)))
+def write_binary_to_file(file_binary: Union[str, bytes], file_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False, atomic: bool = False, fsync: bool = False) -> None:
     '''
     Fail-safe file write operation. Creates directories if needed.
     Does not overwrite existing files if ``overwrite`` is not set.
@@ -57,35 +218,353 @@ def write_binary_to_file(file_binary: Union[str, bytes], file_path: Union[str, P
     :default overwrite: False
     :param file_copy: If overwrite is false and file already exists, write into new file and add a counter to the file name.
     :default file_copy: False
+    :param atomic: write into a temporary file in the same directory and rename it into place afterwards. Readers never see
+        a partially written file and concurrent writers never clobber existing files (or each other's copies) unless
+        ``overwrite`` is set.
+    :default atomic: False
+    :param fsync: flush the file (and with ``atomic`` also its directory) to disk before returning
+    :default fsync: False
     '''
     if overwrite and file_copy:
         raise ValueError("The arguments overwrite and file_copy cannot both be true.")
 
     try:
         file_path = Path(file_path)
-        if file_path.exists():
+        if atomic:
+            _write_file_atomically(file_binary, file_path, overwrite, file_copy, fsync)
+        elif file_path.exists():
             if overwrite:
-                file_path.write_bytes(file_binary)
+                _write_file(file_binary, file_path, fsync)
             elif file_copy:
-                file_path = Path(_get_counted_file_path(str(file_path)))
-                file_path.write_bytes(file_binary)
+                file_path = Path(_COUNTED_FILE_PATH_INDEX.reserve(str(file_path)))
+                _write_file(file_binary, file_path, fsync)
         else:
             create_dir_for_file(file_path)
-            file_path.write_bytes(file_binary)
+            _write_file(file_binary, file_path, fsync)
     except Exception as exc:
         logging.error(f'Could not write file: {exc}', exc_info=True)
+        metrics.record_error('write', exc)
+
+
+def _write_file(file_binary: bytes, file_path: Path, fsync: bool) -> None:
+    if not fsync:
+        file_path.write_bytes(file_binary)
+        return
+    with file_path.open('wb') as file_object:
+        file_object.write(file_binary)
+        file_object.flush()
+        os.fsync(file_object.fileno())
+
+
+def _write_file_atomically(file_binary: bytes, file_path: Path, overwrite: bool, file_copy: bool, fsync: bool) -> None:
+    create_dir_for_file(file_path)
+    tmp_path = _create_temporary_file(file_path)
+    try:
+        _write_file(file_binary, tmp_path, fsync)
+        if _publish_file(tmp_path, file_path, overwrite, file_copy) is not None and fsync:
+            _fsync_directory(file_path.parent)
+    finally:
+        if os.path.lexists(str(tmp_path)):
+            os.unlink(str(tmp_path))
+
+
+def _publish_file(tmp_path: Path, file_path: Path, overwrite: bool, file_copy: bool) -> Optional[Path]:
+    # moves tmp_path into place with the collision semantics of write_binary_to_file, returns None if it was kept back
+    if overwrite:
+        os.replace(str(tmp_path), str(file_path))
+        return file_path
+    if _link_exclusively(tmp_path, file_path):
+        return file_path
+    if file_copy:
+        counted_path = Path(_COUNTED_FILE_PATH_INDEX.reserve(str(file_path)))
+        os.replace(str(tmp_path), str(counted_path))
+        return counted_path
+    return None
+
+
+def _get_temporary_path(file_path: Path) -> Path:
+    return file_path.with_name(f'.{file_path.name}.{os.urandom(4).hex()}.tmp')
+
+
+def _create_temporary_file(file_path: Path) -> Path:
+    # unlike tempfile.mkstemp, os.open applies the umask to the permissions, so the result matches a regular write
+    while True:
+        tmp_path = _get_temporary_path(file_path)
+        try:
+            os.close(os.open(str(tmp_path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            return tmp_path
+        except FileExistsError:
+            continue
+
+
+def _link_exclusively(src_path: Path, dst_path: Path) -> bool:
+    # atomically publishes src_path as dst_path unless dst_path already exists
+    try:
+        os.link(str(src_path), str(dst_path))
+        return True
+    except FileExistsError:
+        return False
+    except OSError:  # file system without hard links: reserve the name first
+        try:
+            os.close(os.open(str(dst_path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+        except FileExistsError:
+            return False
+        os.replace(str(src_path), str(dst_path))
+        return True
+
+
+def _fsync_directory(directory: Path) -> None:
+    try:
+        directory_descriptor = os.open(str(directory), os.O_RDONLY)
+    except OSError:  # e.g. directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
+
+
+@metrics.instrumented('copy')
+def copy_file(src_path: Union[str, Path], dst_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False, follow_symlinks: bool = False, metadata: bool = True, fsync: bool = False) -> Optional[str]:
+    '''
+    Fail-safe file copy operation. Creates directories if needed. The data does not pass through user space if
+    possible: the file is cloned (reflink) or its data segments are copied with ``os.copy_file_range`` or
+    ``os.sendfile``, so holes of sparse files are preserved. Symbolic links are copied as links.
+    The copy is written to a temporary file and moved into place with the collision semantics of
+    :func:`write_binary_to_file` with ``atomic`` set.
+    Errors are logged. No exception raised.
+    Raises a ``ValueError`` if ``overwrite`` and ``file_copy`` are both ``True``.
+
+    :param src_path: Path of the source file. Can be absolute or relative to the current directory.
+    :param dst_path: Path of the copy.
+    :param overwrite: overwrite file if it exists
+    :default overwrite: False
+    :param file_copy: If overwrite is false and file already exists, copy into new file and add a counter to the file name.
+    :default file_copy: False
+    :param follow_symlinks: copy the target of a symbolic link instead of the link
+    :default follow_symlinks: False
+    :param metadata: copy permission bits and access and modification times
+    :default metadata: True
+    :param fsync: flush the copy and its directory to disk before returning
+    :default fsync: False
+    :return: path of the copy; None if the destination exists and was kept or on error
+    '''
+    if overwrite and file_copy:
+        raise ValueError("The arguments overwrite and file_copy cannot both be true.")
+
+    try:
+        return copy_file_or_raise(src_path, dst_path, overwrite, file_copy, follow_symlinks, metadata, fsync)
+    except Exception as exc:
+        logging.error(f'Could not copy file: {exc}', exc_info=True)
+        metrics.record_error('copy', exc)
+        return None
+
+
+def copy_file_or_raise(src_path: Union[str, Path], dst_path: Union[str, Path], overwrite: bool = False, file_copy: bool = False, follow_symlinks: bool = False, metadata: bool = True, fsync: bool = False) -> Optional[str]:
+    '''
+    Variant of :func:`copy_file` raising errors instead of logging them, for callers summarizing failures themselves
+    (e.g. :func:`copy_tree`). Not recorded by :mod:`metrics`.
+
+    :return: path of the copy; None if the destination exists and was kept
+    '''
+    src_path, dst_path = Path(src_path), Path(dst_path)
+    src_stat = os.stat(str(src_path), follow_symlinks=follow_symlinks)
+    if stat.S_ISLNK(src_stat.st_mode):
+        return _copy_symlink(os.readlink(str(src_path)), dst_path, overwrite, file_copy)
+    if not stat.S_ISREG(src_stat.st_mode):
+        raise ValueError(f'{src_path} is no regular file')
+    create_dir_for_file(dst_path)
+    tmp_path = _create_temporary_file(dst_path)
+    try:
+        with src_path.open('rb') as src_file, tmp_path.open('wb') as dst_file:
+            _copy_file_data(src_file.fileno(), dst_file.fileno(), os.fstat(src_file.fileno()).st_size)
+            if metadata:
+                _copy_metadata(dst_file.fileno(), src_stat)
+            if fsync:
+                os.fsync(dst_file.fileno())
+        copy_path = _publish_file(tmp_path, dst_path, overwrite, file_copy)
+        if copy_path is not None and fsync:
+            _fsync_directory(dst_path.parent)
+        return None if copy_path is None else str(copy_path)
+    finally:
+        if os.path.lexists(str(tmp_path)):
+            os.unlink(str(tmp_path))
+
+
+def _copy_symlink(target: str, dst_path: Path, overwrite: bool, file_copy: bool) -> Optional[str]:
+    create_dir_for_file(dst_path)
+    try:
+        os.symlink(target, str(dst_path))
+        return str(dst_path)
+    except FileExistsError:
+        if not overwrite and not file_copy:
+            return None
+    copy_path = str(dst_path) if overwrite else _COUNTED_FILE_PATH_INDEX.reserve(str(dst_path))
+    while True:
+        tmp_path = _get_temporary_path(dst_path)
+        try:
+            os.symlink(target, str(tmp_path))
+            break
+        except FileExistsError:
+            continue
+    try:
+        os.replace(str(tmp_path), copy_path)
+    finally:
+        if os.path.lexists(str(tmp_path)):
+            os.unlink(str(tmp_path))
+    return copy_path
+
+
+def _copy_metadata(file_descriptor: int, source_stat: os.stat_result) -> None:
+    if os.chmod in os.supports_fd:
+        os.chmod(file_descriptor, stat.S_IMODE(source_stat.st_mode))
+    if os.utime in os.supports_fd:
+        os.utime(file_descriptor, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
 
+_FICLONE = 0x40049409  # linux/fs.h: share all blocks of the source (btrfs, xfs, ...)
+_MAX_COPY_CHUNK = 1024 ** 3
+_COPY_UNSUPPORTED_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK}
 
-def _get_counted_file_path(original_path):
-    tmp = re.search(r'-([0-9]+)\Z', original_path)
-    if tmp is not None:
-        current_count = int(tmp.group(1))
-        new_file_path = re.sub(r'-[0-9]+\Z', '-{}'.format(current_count + 1), original_path)
-    else:
-        new_file_path = '{}-1'.format(original_path)
-    return new_file_path
 
+def _copy_file_data(src_descriptor: int, dst_descriptor: int, size: int) -> None:
+    if _clone_file(src_descriptor, dst_descriptor):
+        return
+    for start, end in _get_data_segments(src_descriptor, size):
+        _copy_range(src_descriptor, dst_descriptor, start, end)
+    os.ftruncate(dst_descriptor, size)  # trailing hole
 
+
+def _clone_file(src_descriptor: int, dst_descriptor: int) -> bool:
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(dst_descriptor, _FICLONE, src_descriptor)
+        return True
+    except OSError:
+        return False
+
+
+def _get_data_segments(file_descriptor: int, size: int) -> Iterator[Tuple[int, int]]:
+    # (start, end) of the parts of the file that are no holes
+    if not hasattr(os, 'SEEK_DATA'):
+        yield 0, size
+        return
+    position = 0
+    while position < size:
+        try:
+            start = os.lseek(file_descriptor, position, os.SEEK_DATA)
+        except OSError as exc:
+            if exc.errno != errno.ENXIO:  # ENXIO: only a hole is left
+                yield position, size  # holes cannot be detected on this file system
+            return
+        position = min(os.lseek(file_descriptor, start, os.SEEK_HOLE), size)
+        yield start, position
+
+
+def _copy_range(src_descriptor: int, dst_descriptor: int, start: int, end: int) -> None:
+    # tries the in-kernel copy functions first and falls back to the next one if it is not supported
+    position = start
+    for copy_chunk in _COPY_FUNCTIONS:
+        try:
+            while position < end:
+                copied = copy_chunk(src_descriptor, dst_descriptor, position, min(end - position, _MAX_COPY_CHUNK))
+                if copied == 0:
+                    return  # the source was truncated
+                position += copied
+            return
+        except OSError as exc:
+            if exc.errno not in _COPY_UNSUPPORTED_ERRORS or copy_chunk is _COPY_FUNCTIONS[-1]:
+                raise
+
+
+def _copy_chunk_with_copy_file_range(src_descriptor: int, dst_descriptor: int, position: int, count: int) -> int:
+    return os.copy_file_range(src_descriptor, dst_descriptor, count, position, position)
+
+
+def _copy_chunk_with_sendfile(src_descriptor: int, dst_descriptor: int, position: int, count: int) -> int:
+    os.lseek(dst_descriptor, position, os.SEEK_SET)
+    return os.sendfile(dst_descriptor, src_descriptor, position, count)
+
+
+def _copy_chunk_with_read(src_descriptor: int, dst_descriptor: int, position: int, count: int) -> int:
+    os.lseek(src_descriptor, position, os.SEEK_SET)
+    data = os.read(src_descriptor, min(count, 1024 * 1024))
+    os.lseek(dst_descriptor, position, os.SEEK_SET)
+    return os.write(dst_descriptor, data) if data else 0
+
+
+_COPY_FUNCTIONS = tuple(function for available, function in (
+    (hasattr(os, 'copy_file_range'), _copy_chunk_with_copy_file_range),  # python >= 3.8
+    (hasattr(os, 'sendfile') and sys.platform.startswith('linux'), _copy_chunk_with_sendfile),
+    (True, _copy_chunk_with_read),
+) if available)
+
+
+class _CountedFilePathIndex:
+    '''
+    Per-directory index of the highest counter in use for each file name (``name-<counter>``, see
+    :func:`_split_file_counter`).
+    A directory is scanned once when a name in it is reserved for the first time. Afterwards, reserving the next free
+    counted path costs a single ``O_CREAT|O_EXCL`` open instead of probing ``name-1``, ``name-2``, ... one by one.
+    The exclusive open also protects against paths created by other processes in the meantime.
+    '''
+
+    def __init__(self, max_directories: int = 1024):
+        self._directories = OrderedDict()  # type: OrderedDict
+        self._max_directories = max_directories
+        self._lock = threading.Lock()
+
+    def reserve(self, original_path: str) -> str:
+        '''
+        Creates and returns the next free counted path for ``original_path``.
+        '''
+        directory, name = os.path.split(original_path)
+        base_name, count = _split_file_counter(name)
+        with self._lock:
+            counters = self._get_counters(os.path.abspath(directory))
+            count = max(count, counters.get(base_name, 0))
+            while True:
+                count += 1
+                candidate = os.path.join(directory, f'{base_name}-{count}')
+                try:
+                    os.close(os.open(candidate, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+                    break
+                except FileExistsError:
+                    continue
+            counters[base_name] = count
+        return candidate
+
+    def clear(self) -> None:
+        with self._lock:
+            self._directories.clear()
+
+    def _get_counters(self, directory: str) -> Dict[str, int]:
+        if directory in self._directories:
+            self._directories.move_to_end(directory)
+            return self._directories[directory]
+        counters = {}
+        for name in os.listdir(directory):
+            base_name, count = _split_file_counter(name)
+            if count > counters.get(base_name, 0):
+                counters[base_name] = count
+        self._directories[directory] = counters
+        if len(self._directories) > self._max_directories:
+            self._directories.popitem(last=False)
+        return counters
+
+
+def _split_file_counter(file_name: str) -> Tuple[str, int]:
+    match = re.search(r'-([0-9]+)\Z', file_name)
+    if match is None:
+        return file_name, 0
+    return file_name[:match.start()], int(match.group(1))
+
+
+_COUNTED_FILE_PATH_INDEX = _CountedFilePathIndex()
+
+
+@metrics.instrumented('delete')
 def delete_file(file_path: Union[str, Path]) -> None:
     '''
     Fail-safe delete file operation. Deletes a file if it exists.
@@ -97,8 +576,10 @@ def delete_file(file_path: Union[str, Path]) -> None:
         Path(file_path).unlink()
     except Exception as exc:
         logging.error(f'Could not delete file: {exc}', exc_info=True)
+        metrics.record_error('delete', exc)
 
 
+@metrics.instrumented('symlink')
 def create_symlink(src_path: Union[str, Path], dst_path: Union[str, Path]) -> None:
     '''
     Fail-safe symlink operation. Symlinks a file if dest does not exist.
@@ -112,11 +593,16 @@ def create_symlink(src_path: Union[str, Path], dst_path: Union[str, Path]) -> No
         Path(dst_path).symlink_to(src_path)
     except FileExistsError as exc:
         logging.debug(f'Could not create Link: File exists: {exc}')
+        metrics.record_error('symlink', exc)
     except Exception as exc:
         logging.error(f'Could not create link: {exc}', exc_info=True)
+        metrics.record_error('symlink', exc)
+
+
+SAFE_NAME_CHARACTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_+. '
 
 
-def get_safe_name(file_name: str, max_size: int = 200, valid_characters: str = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_+. ') -> str:
+def get_safe_name(file_name: str, max_size: int = 200, valid_characters: str = SAFE_NAME_CHARACTERS) -> str:
     '''
     removes all problematic characters from a file name
     cuts file names if they are too long
@@ -127,31 +613,146 @@ def get_safe_name(file_name: str, max_size: int = 200, valid_characters: str = '
     :param valid_characters: characters that shall be allowed in a file name
     :default valid_characters: 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_+. '
     '''
-    allowed_charachters = set(valid_characters)
-    safe_name = filter(lambda x: x in allowed_charachters, file_name)
-    safe_name = ''.join(safe_name)
-    safe_name = safe_name.replace(' ', '_')
-    if len(safe_name) > max_size:
-        safe_name = safe_name[0:max_size]
-    return safe_name
+    return file_name.translate(_get_safe_name_table(valid_characters))[:max_size]
+
+
+def get_safe_names(file_names: Iterable[str], max_size: int = 200, valid_characters: str = SAFE_NAME_CHARACTERS, deduplicate: bool = False) -> List[str]:
+    '''
+    Batch variant of :func:`get_safe_name`.
+    Raises a ``ValueError`` if ``deduplicate`` is set and a repeated name cannot be made unique within ``max_size``
+    (the counter suffix is longer than ``max_size``).
+
+    :param file_names: Original file names
+    :param max_size: maximum allowed file name length
+    :default max_size: 200
+    :param valid_characters: characters that shall be allowed in a file name
+    :param deduplicate: make the names unique within the batch by adding a counter (``name-1``, ``name-2``, ...) to repeated names
+    :default deduplicate: False
+    :return: safe names in the order of the original names
+    '''
+    table = _get_safe_name_table(valid_characters)
+    safe_names = [file_name.translate(table)[:max_size] for file_name in file_names]
+    if deduplicate:
+        safe_names = _deduplicate_names(safe_names, max_size)
+    return safe_names
+
+
+class _SafeNameTable(dict):
+    '''
+    ``str.translate`` table deleting all characters that are not allowed and replacing spaces with underscores.
+    Entries are computed on first use of a character.
+    '''
+
+    def __init__(self, valid_characters: str):
+        super().__init__()
+        self.valid_characters = frozenset(valid_characters)
+
+    def __missing__(self, code_point: int) -> Optional[str]:
+        character = chr(code_point)
+        if character not in self.valid_characters:
+            value = None
+        else:
+            value = '_' if character == ' ' else character
+        self[code_point] = value
+        return value
+
+
+@lru_cache(maxsize=32)
+def _get_safe_name_table(valid_characters: str) -> _SafeNameTable:
+    return _SafeNameTable(valid_characters)
+
+
+def _deduplicate_names(names: List[str], max_size: int) -> List[str]:
+    used, counters = set(names), {}
+    result, seen = [], set()
+    for name in names:
+        if name in seen:
+            counter = counters.get(name, 0)
+            while True:
+                counter += 1
+                suffix = f'-{counter}'
+                if len(suffix) > max_size:
+                    raise ValueError(f'Could not make the name {name!r} unique within {max_size} characters')
+                candidate = name[:max(max_size - len(suffix), 0)] + suffix
+                if candidate not in used:
+                    break
+            counters[name] = counter
+            used.add(candidate)
+            name = candidate
+        seen.add(name)
+        result.append(name)
+    return result
 
 
-def get_files_in_dir(directory_path: Union[str, Path]) -> List[str]:
+@metrics.instrumented_walk
+def get_files_in_dir(directory_path: Union[str, Path], workers: int = 1, ordered: bool = True, max_open_dirs: Optional[int] = None) -> List[str]:
     '''
     Returns a list with the absolute paths of all files in the directory directory_path
 
     :param directory_path: directory including files
+    :param workers: number of threads listing sub-directories concurrently. ``1`` walks serially.
+    :default workers: 1
+    :param ordered: return the files in the same order as the serial walk. Otherwise the order depends on which
+        directory listing finishes first. The complete list is returned either way.
+    :default ordered: True
+    :param max_open_dirs: maximum number of directories opened concurrently by the parallel walk
+    :default max_open_dirs: number of workers
     '''
     result = []
     try:
-        for file_path, _, files in os.walk(directory_path):
-            for file_ in files:
-                result.append(str(Path(file_path, file_).absolute()))
+        if workers > 1:
+            result.extend(_walk_files_parallel(directory_path, workers, ordered, max_open_dirs or workers))
+        else:
+            for file_path, _, files in os.walk(directory_path):
+                for file_ in files:
+                    result.append(str(Path(file_path, file_).absolute()))
     except Exception as exc:
         logging.error(f'Could not get files: {exc}', exc_info=True)
+        metrics.record_error('walk', exc)
     return result
 
 
+def _walk_files_parallel(directory_path: Union[str, Path], workers: int, ordered: bool, max_open_dirs: int) -> Iterator[str]:
+    open_dir_slots = threading.BoundedSemaphore(max_open_dirs)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def list_directory(directory: str) -> Tuple[List[str], List[Future]]:
+            # same classification as os.walk: symlinks to directories are neither files nor followed
+            files, sub_directories = [], []
+            with open_dir_slots:
+                try:
+                    with os.scandir(directory) as iterator:
+                        for entry in iterator:
+                            try:
+                                is_dir = entry.is_dir()
+                            except OSError:
+                                is_dir = False
+                            if not is_dir:
+                                files.append(entry.path)
+                            elif not entry.is_symlink():
+                                sub_directories.append(entry.path)
+                except OSError:
+                    pass  # os.walk ignores unreadable directories as well
+            return files, [executor.submit(list_directory, sub_directory) for sub_directory in sub_directories]
+
+        root = executor.submit(list_directory, str(Path(directory_path).absolute()))
+        if ordered:
+            stack = [root]
+            while stack:
+                files, children = stack.pop().result()
+                yield from files
+                stack.extend(reversed(children))
+        else:
+            pending = {root}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, children = future.result()
+                    yield from files
+                    pending.update(children)
+
+
+@metrics.instrumented_walk
 def get_dirs_in_dir(directory_path: Union[str, Path]) -> List[str]:
     '''
     Returns a list with the absolute paths of all 1st level sub-directories in the directory directory_path.
@@ -166,10 +767,126 @@ def get_dirs_in_dir(directory_path: Union[str, Path]) -> List[str]:
                 result.append(str(item.resolve()))
     except Exception as exc:
         logging.error(f'Could not get directories: {exc}', exc_info=True)
+        metrics.record_error('walk', exc)
 
     return result
 
 
+@metrics.instrumented_walk
+def iter_files_in_dir(directory_path: Union[str, Path], max_depth: Optional[int] = None, include: Optional[PathFilter] = None, exclude: Optional[PathFilter] = None, sort: bool = False) -> Iterator[str]:
+    '''
+    Lazy variant of :func:`get_files_in_dir` yielding the absolute paths of all files in the directory directory_path
+    as they are found. Errors are logged. No exception raised.
+
+    Filters are glob patterns (matched against the file name and the path relative to ``directory_path``) or
+    compiled regular expressions (searched in the relative path). Excluded directories are never entered.
+
+    :param directory_path: directory including files
+    :param max_depth: maximum depth of the walk (``1``: only files directly in ``directory_path``, ``0`` or less: none)
+    :default max_depth: unlimited
+    :param include: only yield files matching (one of) the filter(s)
+    :param exclude: skip files and directories matching (one of) the filter(s)
+    :param sort: walk the entries of each directory sorted by name (files and directories interleaved)
+    :default sort: False
+    '''
+    try:
+        include_filters = _compile_path_filters(include)
+        for entry, relative_path, is_dir in _iter_directory_tree(directory_path, max_depth, _compile_path_filters(exclude), sort):
+            if not is_dir and (not include_filters or _matches_path_filters(entry.name, relative_path, include_filters)):
+                yield entry.path
+    except Exception as exc:
+        logging.error(f'Could not get files: {exc}', exc_info=True)
+        metrics.record_error('walk', exc)
+
+
+@metrics.instrumented_walk
+def iter_dirs_in_dir(directory_path: Union[str, Path], max_depth: Optional[int] = 1, include: Optional[PathFilter] = None, exclude: Optional[PathFilter] = None, sort: bool = False) -> Iterator[str]:
+    '''
+    Lazy variant of :func:`get_dirs_in_dir` yielding the absolute (resolved) paths of the sub-directories in the
+    directory directory_path as they are found. Symlinks to directories are yielded but not entered.
+    Errors are logged. No exception raised.
+
+    :param directory_path: directory including sub-directories
+    :param max_depth: maximum depth of the walk (``None``: unlimited, ``0`` or less: none)
+    :default max_depth: 1
+    :param include: only yield directories matching (one of) the filter(s), see :func:`iter_files_in_dir`
+    :param exclude: skip (and do not enter) directories matching (one of) the filter(s)
+    :param sort: walk the entries of each directory sorted by name
+    :default sort: False
+    '''
+    try:
+        include_filters = _compile_path_filters(include)
+        for entry, relative_path, is_dir in _iter_directory_tree(directory_path, max_depth, _compile_path_filters(exclude), sort):
+            if is_dir and (not include_filters or _matches_path_filters(entry.name, relative_path, include_filters)):
+                yield str(Path(entry.path).resolve())
+    except Exception as exc:
+        logging.error(f'Could not get directories: {exc}', exc_info=True)
+        metrics.record_error('walk', exc)
+
+
+def _iter_directory_tree(directory_path: Union[str, Path], max_depth: Optional[int], exclude_filters: List[Tuple[Pattern, bool]], sort: bool) -> Iterator[Tuple[os.DirEntry, str, bool]]:
+    # yields (entry, relative path, is_dir) in the order of os.walk (files of a directory before its sub-directories)
+    if max_depth is not None and max_depth < 1:
+        return
+    root = str(Path(directory_path).absolute())
+    root_prefix_length = len(os.path.join(root, ''))
+    stack = [(iter(_list_tree_level(root, root_prefix_length, exclude_filters, sort, raise_errors=True)), 1)]
+    while stack:
+        level, depth = stack[-1]
+        item = next(level, None)
+        if item is None:
+            stack.pop()
+            continue
+        yield item
+        entry, _, is_dir = item
+        if is_dir and (max_depth is None or depth < max_depth) and not entry.is_symlink():
+            stack.append((iter(_list_tree_level(entry.path, root_prefix_length, exclude_filters, sort)), depth + 1))
+
+
+def _list_tree_level(directory: str, root_prefix_length: int, exclude_filters: List[Tuple[Pattern, bool]], sort: bool, raise_errors: bool = False) -> List[Tuple[os.DirEntry, str, bool]]:
+    files, sub_directories = [], []
+    try:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                relative_path = entry.path[root_prefix_length:]
+                if exclude_filters and _matches_path_filters(entry.name, relative_path, exclude_filters):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (sub_directories if is_dir else files).append((entry, relative_path, is_dir))
+    except OSError:
+        if raise_errors:
+            raise
+        return []  # like os.walk, unreadable sub-directories are skipped
+    if sort:
+        return sorted(files + sub_directories, key=lambda item: item[0].name)
+    return files + sub_directories
+
+
+def _compile_path_filters(path_filters: Optional[PathFilter]) -> List[Tuple[Pattern, bool]]:
+    # returns (regex, is_glob) tuples
+    if path_filters is None:
+        return []
+    if isinstance(path_filters, (str, Pattern)):
+        path_filters = [path_filters]
+    return [
+        (path_filter, False) if isinstance(path_filter, Pattern) else (re.compile(fnmatch.translate(path_filter)), True)
+        for path_filter in path_filters
+    ]
+
+
+def _matches_path_filters(name: str, relative_path: str, compiled_filters: List[Tuple[Pattern, bool]]) -> bool:
+    for regex, is_glob in compiled_filters:
+        if is_glob:
+            if regex.match(name) or regex.match(relative_path):
+                return True
+        elif regex.search(relative_path):
+            return True
+    return False
+
+
 def get_dir_of_file(file_path: Union[str, Path]) -> str:
     '''
     Returns absolute path of the directory including file
@@ -190,27 +907,56 @@ def safe_rglob(path: Path, include_symlinks: bool = True, include_directories: b
     '''
     alternative to pathlib.rglob which tries to follow symlinks and crashes if it encounters certain broken ones
     '''
-    if not path.is_symlink() and path.is_dir():
-        for child_path in path.iterdir():
-            yield from _iterate_path_recursively(child_path, include_symlinks, include_directories)
-    else:
-        yield from []
+    for entry in safe_scandir(path, include_symlinks, include_directories):
+        yield Path(entry.path)
 
 
-def _iterate_path_recursively(path: Path, include_symlinks: bool = True, include_directories: bool = True):
+@metrics.instrumented_walk
+def safe_scandir(path: Union[str, Path], include_symlinks: bool = True, include_directories: bool = True) -> Iterator[os.DirEntry]:
+    '''
+    Non-recursive variant of :func:`safe_rglob` built on ``os.scandir``. The file type information cached in the
+    ``os.DirEntry`` objects is used, so regular files and directories cost no additional ``stat`` call.
+    The yielded entries cache their stat result as well: ``entry.stat()`` is resolved at most once per entry.
+    Errors are logged. No exception raised.
+
+    :param path: root directory of the walk
+    :param include_symlinks: yield symlinks pointing to existing files or directories (they are never followed)
+    :param include_directories: yield directories (they are traversed either way)
+    :return: generator of ``os.DirEntry`` objects in depth-first pre-order
+    '''
+    path = Path(path)
+    if path.is_symlink() or not path.is_dir():
+        return
+    stack = [iter(_scandir_list(path))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        try:
+            if entry.is_symlink():
+                if include_symlinks and (entry.is_file() or entry.is_dir()):
+                    yield entry
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+            elif entry.is_dir(follow_symlinks=False):
+                if include_directories:
+                    yield entry
+                stack.append(iter(_scandir_list(entry.path)))
+        except OSError as exc:
+            logging.warning(f'possible broken symlink: {Path(entry.path).absolute()}')
+            metrics.record_error('walk', exc)
+
+
+def _scandir_list(path: Union[str, Path]) -> List[os.DirEntry]:
+    # read the whole listing so that the directory handle is closed before descending further
     try:
-        if path.is_symlink():
-            if include_symlinks and (path.is_file() or path.is_dir()):
-                yield path
-        elif path.is_file():
-            yield path
-        elif path.is_dir():
-            if include_directories:
-                yield path
-            for child_path in path.iterdir():
-                yield from _iterate_path_recursively(child_path, include_symlinks, include_directories)
-    except PermissionError:
-        logging.error(f'Permission Error: could not access path {path.absolute()}')
-    except OSError:
-        logging.warning(f'possible broken symlink: {path.absolute()}')
-    yield from []
+        with os.scandir(path) as iterator:
+            return list(iterator)
+    except PermissionError as exc:
+        logging.error(f'Permission Error: could not access path {Path(path).absolute()}')
+        metrics.record_error('walk', exc)
+    except OSError as exc:
+        logging.warning(f'possible broken symlink: {Path(path).absolute()}')
+        metrics.record_error('walk', exc)
+    return []
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import stat
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from .fail_safe_file_operations import get_binary_from_file
+from .file_functions import read_in_chunks
+
+CacheKey = Tuple[int, int, int, int]
+
+
+class FileCache:
+    '''
+    Caching layer for file reads and file digests. Entries are keyed on ``(device, inode, size, mtime_ns)``,
+    so a file is read or hashed again only if it changed. File contents are evicted least recently used first as soon
+    as they exceed ``max_bytes``. Digests are small and kept for the lifetime of the cache. If ``index_path`` is set,
+    digests are additionally stored in an SQLite database and survive process restarts.
+    All methods are thread-safe and fail-safe: Errors are logged. No exception raised.
+
+    Can be used as context manager, which calls :meth:`close` on exit::
+
+        with FileCache(max_bytes=512 * 1024 * 1024, index_path='digests.db') as cache:
+            binary = cache.get_binary_from_file('some_file')
+            digest = cache.get_file_digest('some_file', 'sha256')
+
+    :param max_bytes: maximum size of all cached file contents
+    :param index_path: path of the persistent digest index
+    '''
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, index_path: Optional[Union[str, Path]] = None):
+        self.max_bytes = max_bytes
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._binaries = OrderedDict()  # type: OrderedDict
+        self._digests = {}  # type: Dict[Tuple[CacheKey, str], str]
+        self._lock = threading.RLock()
+        self._index = None
+        if index_path is not None:
+            self._open_index(index_path)
+
+    def __enter__(self) -> 'FileCache':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def get_binary_from_file(self, file_path: Union[str, Path]) -> Union[str, bytes]:
+        '''
+        Cached variant of :func:`common_helper_files.get_binary_from_file`.
+
+        :param file_path: Path of the file. Can be absolute or relative to the current directory.
+        :return: file's binary as bytes; returns empty byte string on error
+        '''
+        try:
+            path = Path(file_path)
+            if path.is_symlink():
+                return get_binary_from_file(path)
+            with path.open('rb') as file_object:
+                key = _get_cache_key(os.fstat(file_object.fileno()))
+                if key is None:
+                    return file_object.read()
+                with self._lock:
+                    if key in self._binaries:
+                        self.hits += 1
+                        self._binaries.move_to_end(key)
+                        return self._binaries[key]
+                    self.misses += 1
+                binary = file_object.read()
+            self._store_binary(key, binary)
+            return binary
+        except Exception as exc:
+            logging.error(f'Could not read file: {exc}', exc_info=True)
+            return b''
+
+    def get_file_digest(self, file_path: Union[str, Path], algorithm: str = 'sha256') -> str:
+        '''
+        Cached variant of :func:`common_helper_files.get_file_digest`. Cached file contents are hashed without
+        reading the file again.
+
+        :param file_path: Path of the file. Can be absolute or relative to the current directory.
+        :param algorithm: name of a ``hashlib`` algorithm
+        :return: hex digest of the file; returns empty string on error
+        '''
+        try:
+            path = Path(file_path)
+            if path.is_symlink():
+                return hashlib.new(algorithm, get_binary_from_file(path).encode('utf-8', 'surrogateescape')).hexdigest()
+            with path.open('rb') as file_object:
+                key = _get_cache_key(os.fstat(file_object.fileno()))
+                digest = self._lookup_digest(key, algorithm) if key is not None else None
+                if digest is not None:
+                    return digest
+                with self._lock:
+                    binary = self._binaries.get(key) if key is not None else None
+                if binary is not None:
+                    digest = hashlib.new(algorithm, binary).hexdigest()
+                else:
+                    file_hash = hashlib.new(algorithm)
+                    for chunk in read_in_chunks(file_object, chunk_size=1024 * 1024):
+                        file_hash.update(chunk)
+                    digest = file_hash.hexdigest()
+            if key is not None:
+                self._store_digest(key, algorithm, digest)
+            return digest
+        except Exception as exc:
+            logging.error(f'Could not hash file: {exc}', exc_info=True)
+            return ''
+
+    def get_statistics(self) -> Dict[str, int]:
+        '''
+        :return: hit and miss counters, number of cached entries and size of the cached file contents
+        '''
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'cached_files': len(self._binaries),
+                'cached_bytes': self.cached_bytes,
+                'cached_digests': len(self._digests),
+            }
+
+    def clear(self) -> None:
+        '''
+        Removes all in-memory entries. The persistent index is kept.
+        '''
+        with self._lock:
+            self._binaries.clear()
+            self._digests.clear()
+            self.cached_bytes = 0
+
+    def flush(self) -> None:
+        '''
+        Commits pending digests to the persistent index.
+        '''
+        with self._lock:
+            if self._index is not None:
+                try:
+                    self._index.commit()
+                except sqlite3.Error as exc:
+                    logging.error(f'Could not write digest index: {exc}', exc_info=True)
+
+    def close(self) -> None:
+        '''
+        Commits pending digests and closes the persistent index.
+        '''
+        self.flush()
+        with self._lock:
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+    def _store_binary(self, key: CacheKey, binary: bytes) -> None:
+        if len(binary) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._binaries:
+                return
+            self._binaries[key] = binary
+            self.cached_bytes += len(binary)
+            while self.cached_bytes > self.max_bytes:
+                _, evicted = self._binaries.popitem(last=False)
+                self.cached_bytes -= len(evicted)
+
+    def _lookup_digest(self, key: CacheKey, algorithm: str) -> Optional[str]:
+        with self._lock:
+            digest = self._digests.get((key, algorithm))
+            if digest is None and self._index is not None:
+                row = self._index.execute(
+                    'SELECT digest FROM digests WHERE device=? AND inode=? AND size=? AND mtime_ns=? AND algorithm=?', (*key, algorithm)
+                ).fetchone()
+                if row is not None:
+                    digest = self._digests[(key, algorithm)] = row[0]
+            if digest is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return digest
+
+    def _store_digest(self, key: CacheKey, algorithm: str, digest: str) -> None:
+        with self._lock:
+            self._digests[(key, algorithm)] = digest
+            if self._index is not None:
+                try:
+                    self._index.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)', (*key, algorithm, digest))
+                except sqlite3.Error as exc:
+                    logging.error(f'Could not write digest index: {exc}', exc_info=True)
+
+    def _open_index(self, index_path: Union[str, Path]) -> None:
+        try:
+            self._index = sqlite3.connect(str(index_path), check_same_thread=False)
+            self._index.execute(
+                'CREATE TABLE IF NOT EXISTS digests (device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT, digest TEXT, '
+                'PRIMARY KEY (device, inode, size, mtime_ns, algorithm))'
+            )
+        except sqlite3.Error as exc:
+            logging.error(f'Could not open digest index: {exc}', exc_info=True)
+            self._index = None
+
+
+def _get_cache_key(file_stat: os.stat_result) -> Optional[CacheKey]:
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None  # pipes, devices, ... are not cached
+    return file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
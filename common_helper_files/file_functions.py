@@ -1,8 +1,10 @@
 import io
+import os
 from pathlib import Path
-from typing import Type, Union
+from typing import BinaryIO, Callable, Iterator, Optional, Type, Union
 
-import bitmath
+MIN_AUTO_CHUNK_SIZE = 128 * 1024
+BINARY_UNITS = ('KiB', 'MiB', 'GiB', 'TiB', 'PiB', 'EiB', 'ZiB', 'YiB')
 
 
 def read_in_chunks(file_object: Type[io.BufferedReader], chunk_size=1024) -> bytes:
@@ -24,6 +26,67 @@ def read_in_chunks(file_object: Type[io.BufferedReader], chunk_size=1024) -> byt
         yield data
 
 
+def read_into_chunks(file_object: Union[int, BinaryIO], chunk_size: Optional[int] = None, overlap: int = 0) -> Iterator[memoryview]:
+    '''
+    Faster alternative to :func:`read_in_chunks`. The chunks are read with ``readinto`` into a single preallocated buffer
+    and yielded as ``memoryview`` slices of it, so no new objects are allocated per chunk. Can be used like this::
+
+        with open('somelargefile.xyz', 'rb') as file_object:
+            for chunk in read_into_chunks(file_object, overlap=len(signature) - 1):
+                if signature in chunk:
+                    ...
+
+    A yielded chunk is only valid until the next chunk is requested. Use ``bytes(chunk)`` to keep it.
+
+    :param file_object: The file object (any object with ``readinto`` or ``read`` method) or raw file descriptor from which the chunk data is read.
+    :param chunk_size: Number of bytes to read per chunk. Per default, a multiple of the preferred block size of the file system (``st_blksize``) but at least 128 KiB.
+    :param overlap: Number of bytes of the previous chunk repeated at the start of each chunk, e.g. to find signatures spanning chunk boundaries.
+    :default overlap: 0
+    :return: Returns a generator to iterate over all chunks, see above for usage.
+    '''
+    if chunk_size is None:
+        chunk_size = _get_default_chunk_size(file_object)
+    if chunk_size <= 0 or not 0 <= overlap < chunk_size:
+        raise ValueError('chunk_size must be positive and overlap must be between 0 and chunk_size')
+    readinto = _get_readinto(file_object)
+    view = memoryview(bytearray(overlap + chunk_size))
+    carried = 0
+    while True:
+        bytes_read = readinto(view[carried:carried + chunk_size])
+        if not bytes_read:
+            break
+        end = carried + bytes_read
+        yield view[:end]
+        if overlap:
+            carried = min(overlap, end)
+            view[:carried] = view[end - carried:end]
+
+
+def _get_default_chunk_size(file_object: Union[int, BinaryIO]) -> int:
+    try:
+        block_size = os.fstat(file_object if isinstance(file_object, int) else file_object.fileno()).st_blksize
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        block_size = io.DEFAULT_BUFFER_SIZE
+    block_size = block_size or io.DEFAULT_BUFFER_SIZE
+    return max(block_size, -(-MIN_AUTO_CHUNK_SIZE // block_size) * block_size)
+
+
+def _get_readinto(file_object: Union[int, BinaryIO]) -> Callable[[memoryview], int]:
+    if isinstance(file_object, int):
+        if hasattr(os, 'readv'):
+            return lambda buffer: os.readv(file_object, [buffer])
+        return lambda buffer: _read_into_buffer(lambda size: os.read(file_object, size), buffer)
+    if hasattr(file_object, 'readinto'):
+        return file_object.readinto
+    return lambda buffer: _read_into_buffer(file_object.read, buffer)
+
+
+def _read_into_buffer(read: Callable[[int], bytes], buffer: memoryview) -> int:
+    data = read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+
 def get_directory_for_filename(filename: Union[str, Path]) -> str:
     '''
     Convenience function which returns the absolute path to the directory that contains the given file name.
@@ -54,6 +117,13 @@ def human_readable_file_size(size_in_bytes: int) -> str:
     '''
     Returns a nicely human readable file size
 
-    :param size_in_bytes: Size in Bytes
+    :param size_in_bytes: Size in Bytes. ``bitmath`` quantities are formatted with ``bitmath`` (optional dependency).
     '''
-    return bitmath.Byte(bytes=size_in_bytes).best_prefix().format('{value:.2f} {unit}')
+    if type(size_in_bytes).__module__ == 'bitmath':
+        return size_in_bytes.best_prefix().format('{value:.2f} {unit}')
+    value, unit = float(size_in_bytes), 'Byte'
+    for binary_unit in BINARY_UNITS:
+        if abs(value) < 1024:
+            break
+        value, unit = value / 1024, binary_unit
+    return f'{value:.2f} {unit}'
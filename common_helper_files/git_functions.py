@@ -1,5 +1,413 @@
-import subprocess
+import mmap
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .file_functions import create_dir_for_file
+
+MINIMUM_ABBREV = 7
+_HEX_SHA = re.compile(r'^[0-9a-f]{40}$')
+_OBJECT_TYPES = {1: b'commit', 2: b'tree', 3: b'blob', 4: b'tag'}
+
+# git directory -> (paths whose mtimes were recorded, their mtimes, version)
+_VERSION_CACHE = {}  # type: Dict[str, Tuple[List[str], List[Optional[int]], str]]
 
 
 def get_version_string_from_git(directory_name: str) -> str:
+    '''
+    Returns the output of ``git describe --always`` for the repository containing ``directory_name``.
+    HEAD, refs, packed-refs and tags are read from the git directory without running ``git``. Only if the history
+    would have to be walked (annotated tags exist, but none of them points to HEAD) or the repository is not supported
+    (reftable, SHA-256, alternates, ...), ``git describe`` is run as a subprocess.
+    Results are cached per repository until HEAD, the refs, packed-refs, tags or packs change.
+
+    :param directory_name: a directory inside the git repository
+    :return: the version string, e.g. ``v1.2`` or ``1a2b3c4``
+    '''
+    repository = _GitRepository.find(directory_name)
+    if repository is None:
+        return _describe_with_git(directory_name)
+    cached = _VERSION_CACHE.get(repository.git_dir)
+    if cached is not None and _get_mtimes(cached[0]) == cached[1]:
+        return cached[2]
+    watched_paths = repository.get_watched_paths()
+    mtimes = _get_mtimes(watched_paths)
+    try:
+        version = repository.describe()
+    except (_UnsupportedRepository, OSError, ValueError):
+        version = None
+    if version is None:
+        version = _describe_with_git(directory_name)
+    _VERSION_CACHE[repository.git_dir] = (watched_paths, mtimes, version)
+    return version
+
+
+def write_version_file(directory_name: str, file_path: Union[str, Path], template: str = '__version__ = \'{version}\'\n') -> str:
+    '''
+    Writes the version of the git repository containing ``directory_name`` to a generated file, e.g. a
+    ``_version.py`` created at build time, so the installed package needs neither git nor the repository at runtime.
+
+    :param directory_name: a directory inside the git repository
+    :param file_path: the generated file
+    :param template: content of the file, ``{version}`` is replaced by the version string
+    :default template: "__version__ = '{version}'\\n"
+    :return: the version string written to the file
+    '''
+    version = get_version_string_from_git(directory_name)
+    create_dir_for_file(str(file_path))
+    Path(file_path).write_text(template.format(version=version))
+    return version
+
+
+def _describe_with_git(directory_name: str) -> str:
+    import subprocess  # only needed if the repository cannot be read directly
     return subprocess.check_output(['git', 'describe', '--always'], cwd=directory_name).strip().decode('utf-8')
+
+
+def _get_mtimes(paths: List[str]) -> List[Optional[int]]:
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+class _UnsupportedRepository(Exception):
+    pass
+
+
+class _GitRepository:
+    '''
+    Read-only access to the refs and objects of a git repository, limited to what ``git describe --always`` needs
+    when no history walk is necessary.
+    '''
+
+    def __init__(self, git_dir: str, common_dir: str):
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.objects_dir = os.path.join(common_dir, 'objects')
+        self.abbrev = None  # type: Optional[int]
+        self._packs = None  # type: Optional[List[_Pack]]
+
+    @classmethod
+    def find(cls, directory_name: str) -> Optional['_GitRepository']:
+        if 'GIT_DIR' in os.environ:
+            return None
+        directory = Path(directory_name).absolute()
+        for candidate in (directory, *directory.parents):
+            dot_git = candidate / '.git'
+            if dot_git.is_dir():
+                git_dir = dot_git
+            elif dot_git.is_file():  # worktrees and submodules: "gitdir: <path>"
+                content = dot_git.read_text().strip()
+                if not content.startswith('gitdir:'):
+                    return None
+                git_dir = candidate / content[len('gitdir:'):].strip()
+            else:
+                continue
+            common_dir = git_dir
+            if (git_dir / 'commondir').is_file():
+                common_dir = git_dir / (git_dir / 'commondir').read_text().strip()
+            return cls(os.path.realpath(str(git_dir)), os.path.realpath(str(common_dir)))
+        return None
+
+    def get_watched_paths(self) -> List[str]:
+        '''
+        :return: files and directories whose mtime changes whenever the result of ``describe`` may change
+        '''
+        paths = [os.path.join(self.git_dir, 'HEAD'), os.path.join(self.common_dir, 'packed-refs')]
+        try:
+            paths.extend(os.path.join(self.common_dir, ref) for ref in self._get_symbolic_ref_chain())
+        except (OSError, _UnsupportedRepository):
+            pass
+        tags_dir = os.path.join(self.common_dir, 'refs', 'tags')
+        paths.append(tags_dir)
+        paths.extend(root for root, _, _ in os.walk(tags_dir) if root != tags_dir)
+        paths.append(os.path.join(self.common_dir, 'config'))
+        paths.append(os.path.join(self.objects_dir, 'pack'))
+        return paths
+
+    def describe(self) -> Optional[str]:
+        '''
+        :return: the ``git describe --always`` output or ``None`` if the history would have to be walked
+        '''
+        self._check_config()
+        head = self._resolve_head()
+        annotated_tags = self._get_annotated_tags()
+        tags_at_head = [name for name, commit in annotated_tags.items() if commit == head]
+        if len(tags_at_head) == 1:
+            return tags_at_head[0]
+        if tags_at_head or annotated_tags:
+            return None  # several candidates (ordered by tagger date) or a history walk needed
+        return head[:self._get_abbreviation_length(head)]
+
+    def _check_config(self):
+        config = {}
+        for path in _get_global_config_paths() + [os.path.join(self.common_dir, 'config')]:
+            config.update(_read_config(path))
+        if (
+            config.get(('extensions', 'objectformat'), 'sha1').lower() != 'sha1'
+            or config.get(('extensions', 'refstorage'), 'files').lower() != 'files'
+            or ('extensions', 'compatobjectformat') in config
+        ):
+            raise _UnsupportedRepository('object format or ref storage not supported')
+        if os.path.exists(os.path.join(self.objects_dir, 'info', 'alternates')):
+            raise _UnsupportedRepository('alternates not supported')
+        abbrev = config.get(('core', 'abbrev'), 'auto').lower()
+        if abbrev in ('no', 'false', 'off'):
+            self.abbrev = 40
+        elif abbrev != 'auto':
+            try:
+                self.abbrev = min(max(int(abbrev), 4), 40)
+            except ValueError:
+                raise _UnsupportedRepository(f'core.abbrev {abbrev} not supported')
+
+    # --- refs ---
+
+    def _get_symbolic_ref_chain(self) -> List[str]:
+        chain = []
+        content = Path(self.git_dir, 'HEAD').read_text().strip()
+        while content.startswith('ref:'):
+            ref = content[len('ref:'):].strip()
+            if ref in chain or len(chain) > 5:
+                raise _UnsupportedRepository('symbolic ref loop')
+            chain.append(ref)
+            content = self._read_loose_ref(ref) or ''
+        return chain
+
+    def _resolve_head(self) -> str:
+        content = Path(self.git_dir, 'HEAD').read_text().strip()
+        chain = self._get_symbolic_ref_chain()
+        if chain:
+            content = self._read_loose_ref(chain[-1]) or self._read_packed_refs()[0].get(chain[-1], '')
+        if not _HEX_SHA.match(content):
+            raise _UnsupportedRepository('HEAD could not be resolved')  # e.g. unborn branch, reftable
+        return content
+
+    def _read_loose_ref(self, ref: str) -> Optional[str]:
+        try:
+            return Path(self.common_dir, ref).read_text().strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _read_packed_refs(self) -> Tuple[Dict[str, str], Dict[str, str], bool]:
+        '''
+        :return: refs, peeled values of annotated tags and whether all tags are peeled (so refs without peeled value
+            are no annotated tags)
+        '''
+        refs, peeled, fully_peeled = {}, {}, False
+        try:
+            lines = Path(self.common_dir, 'packed-refs').read_text().splitlines()
+        except OSError:
+            return refs, peeled, True
+        name = None
+        for line in lines:
+            if line.startswith('#'):
+                traits = line.split(':', 1)[-1].split()
+                fully_peeled = 'peeled' in traits or 'fully-peeled' in traits
+            elif line.startswith('^'):
+                if name is not None:
+                    peeled[name] = line[1:].strip()
+            elif line:
+                sha, name = line.split(' ', 1)
+                refs[name] = sha
+        return refs, peeled, fully_peeled
+
+    def _get_annotated_tags(self) -> Dict[str, str]:
+        '''
+        :return: names of all annotated tags and the commits (or other objects) they point to
+        '''
+        packed_refs, peeled, fully_peeled = self._read_packed_refs()
+        candidates = {name: sha for name, sha in packed_refs.items() if name.startswith('refs/tags/')}
+        tags_dir = os.path.join(self.common_dir, 'refs', 'tags')
+        for root, _, files in os.walk(tags_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                ref = os.path.relpath(path, self.common_dir).replace(os.sep, '/')
+                content = self._read_loose_ref(ref)
+                if content is not None and _HEX_SHA.match(content):
+                    candidates[ref] = content
+                    peeled.pop(ref, None)
+        annotated = {}
+        for ref, sha in candidates.items():
+            if ref in peeled:
+                annotated[ref[len('refs/tags/'):]] = peeled[ref]
+            elif not (fully_peeled and ref in packed_refs and packed_refs[ref] == sha):
+                target = self._peel(sha)
+                if target != sha:
+                    annotated[ref[len('refs/tags/'):]] = target
+        return annotated
+
+    # --- objects ---
+
+    def _peel(self, sha: str) -> str:
+        for _ in range(10):
+            object_type, content = self._read_object(sha)
+            if object_type != b'tag':
+                return sha
+            first_line = content.split(b'\n', 1)[0]
+            if not first_line.startswith(b'object '):
+                raise _UnsupportedRepository(f'invalid tag object {sha}')
+            sha = first_line[len(b'object '):].decode()
+        raise _UnsupportedRepository('tag chain too long')
+
+    def _read_object(self, sha: str) -> Tuple[bytes, bytes]:
+        try:
+            data = zlib.decompress(Path(self.objects_dir, sha[:2], sha[2:]).read_bytes())
+        except FileNotFoundError:
+            for pack in self._get_packs():
+                offset = pack.find(sha)
+                if offset is not None:
+                    return pack.read_object(offset)
+            raise _UnsupportedRepository(f'object {sha} not found')
+        header, content = data.split(b'\0', 1)
+        return header.split(b' ', 1)[0], content
+
+    def _get_packs(self) -> List['_Pack']:
+        if self._packs is None:
+            pack_dir = os.path.join(self.objects_dir, 'pack')
+            try:
+                names = sorted(name for name in os.listdir(pack_dir) if name.endswith('.idx'))
+            except FileNotFoundError:
+                names = []
+            self._packs = [_Pack(os.path.join(pack_dir, name)) for name in names]
+        return self._packs
+
+    def _get_abbreviation_length(self, sha: str) -> int:
+        length = self.abbrev
+        if length is None:  # core.abbrev=auto, same estimate as git: packed objects only
+            object_count = sum(pack.count for pack in self._get_packs())
+            length = max(MINIMUM_ABBREV, (object_count.bit_length() + 1) // 2)
+        for other in self._get_neighbours(sha):
+            length = max(length, _get_common_prefix_length(sha, other) + 1)
+        return min(length, 40)
+
+    def _get_neighbours(self, sha: str) -> List[str]:
+        neighbours = []
+        try:
+            neighbours.extend(sha[:2] + name for name in os.listdir(os.path.join(self.objects_dir, sha[:2])) if name != sha[2:])
+        except FileNotFoundError:
+            pass
+        for pack in self._get_packs():
+            neighbours.extend(pack.get_neighbours(sha))
+        return neighbours
+
+
+def _get_global_config_paths() -> List[str]:
+    xdg_config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return ['/etc/gitconfig', os.path.join(xdg_config_home, 'git', 'config'), os.path.expanduser('~/.gitconfig')]
+
+
+def _read_config(path: str) -> Dict[Tuple[str, str], str]:
+    '''
+    Minimal git config parser: (section, key) -> value, subsections and includes are ignored.
+    '''
+    config, section = {}, ''
+    try:
+        lines = Path(path).read_text(errors='replace').splitlines()
+    except OSError:
+        return config
+    for line in lines:
+        line = line.split('#', 1)[0].split(';', 1)[0].strip()
+        if line.startswith('['):
+            section = (line.strip('[]').split() or [''])[0].lower()
+        elif '=' in line:
+            key, value = line.split('=', 1)
+            config[(section, key.strip().lower())] = value.strip().strip('"')
+        elif line:
+            config[(section, line.lower())] = 'true'
+    return config
+
+
+def _get_common_prefix_length(first: str, second: str) -> int:
+    length = 0
+    for first_char, second_char in zip(first, second):
+        if first_char != second_char:
+            break
+        length += 1
+    return length
+
+
+class _Pack:
+    '''
+    Lookup in a version 2 pack index and reading of undeltified objects from the pack.
+    '''
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, 'rb') as index_file:
+            self.index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index[:8] != b'\377tOc\0\0\0\2':
+            raise _UnsupportedRepository(f'pack index version not supported: {index_path}')
+        self.count = int.from_bytes(self.index[8 + 255 * 4:8 + 256 * 4], 'big')
+        self._names_offset = 8 + 256 * 4
+        self._offsets_offset = self._names_offset + self.count * 24  # names (20 bytes) and CRCs (4 bytes)
+
+    def _get_name(self, position: int) -> bytes:
+        start = self._names_offset + position * 20
+        return self.index[start:start + 20]
+
+    def _bisect(self, name: bytes) -> int:
+        first_byte = name[0]
+        low = int.from_bytes(self.index[8 + (first_byte - 1) * 4:8 + first_byte * 4], 'big') if first_byte else 0
+        high = int.from_bytes(self.index[8 + first_byte * 4:12 + first_byte * 4], 'big')
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, sha: str) -> Optional[int]:
+        '''
+        :return: offset of the object in the pack or ``None`` if it is not contained
+        '''
+        name = bytes.fromhex(sha)
+        position = self._bisect(name)
+        if position >= self.count or self._get_name(position) != name:
+            return None
+        offset = int.from_bytes(self.index[self._offsets_offset + position * 4:self._offsets_offset + position * 4 + 4], 'big')
+        if offset & 0x80000000:
+            large_offset = self._offsets_offset + self.count * 4 + (offset & 0x7fffffff) * 8
+            offset = int.from_bytes(self.index[large_offset:large_offset + 8], 'big')
+        return offset
+
+    def get_neighbours(self, sha: str) -> List[str]:
+        '''
+        :return: the objects sorted directly before and after ``sha`` (sharing the longest prefixes with it)
+        '''
+        name = bytes.fromhex(sha)
+        position = self._bisect(name)
+        neighbours = []
+        if position > 0:
+            neighbours.append(self._get_name(position - 1).hex())
+        if position < self.count and self._get_name(position) == name:
+            position += 1
+        if position < self.count:
+            neighbours.append(self._get_name(position).hex())
+        return neighbours
+
+    def read_object(self, offset: int) -> Tuple[bytes, bytes]:
+        with open(self.index_path[:-len('.idx')] + '.pack', 'rb') as pack_file:
+            pack_file.seek(offset)
+            header = pack_file.read(32)
+            object_type = (header[0] >> 4) & 7
+            if object_type not in _OBJECT_TYPES:
+                raise _UnsupportedRepository('deltified objects not supported')
+            position = 0
+            while header[position] & 0x80:
+                position += 1
+            pack_file.seek(offset + position + 1)
+            decompressor = zlib.decompressobj()
+            content = b''
+            while not decompressor.eof:
+                chunk = pack_file.read(4096)
+                if not chunk:
+                    break
+                content += decompressor.decompress(chunk)
+        return _OBJECT_TYPES[object_type], content
@@ -0,0 +1,256 @@
+'''
+Optional instrumentation of the fail-safe file operations. Reads, writes, copies, deletes, symlinks and directory walks
+record the number of calls, transferred bytes (walked entries for walks and bulk operations), errors by type and a
+latency histogram.
+Recording is disabled by default and costs a single check per call then::
+
+    enable_metrics()
+    add_metrics_callback(lambda operation, duration, size, error: ...)  # forward to your own metrics stack
+    ...
+    print(get_metrics_summary())
+
+    with profile_file_operations() as profile:
+        ...
+    print(profile.get_summary())
+'''
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+OPERATIONS = ('read', 'write', 'copy', 'delete', 'symlink', 'walk')
+MetricsCallback = Callable[[str, float, int, Optional[str]], None]
+
+_HISTOGRAM_BUCKETS = 40  # bucket i counts latencies below 2 ** i microseconds
+
+
+class OperationMetrics:
+    '''
+    Counters and latency histogram of one operation type.
+    '''
+
+    def __init__(self):
+        self.calls = 0
+        self.size = 0
+        self.errors = Counter()
+        self.histogram = [0] * _HISTOGRAM_BUCKETS
+
+    def get_percentile(self, percentile: float) -> float:
+        '''
+        :return: upper bound (in seconds) of the histogram bucket containing the percentile; ``0.0`` without calls
+        '''
+        threshold = percentile / 100 * sum(self.histogram)
+        cumulated = 0
+        for bucket, count in enumerate(self.histogram):
+            cumulated += count
+            if count and cumulated >= threshold:
+                return 2 ** bucket / 1e6
+        return 0.0
+
+
+class MetricsRegistry:
+    '''
+    Thread-safe collection of :class:`OperationMetrics` per operation. Every recorded event is also passed to the
+    registered callbacks as ``callback(operation, duration, size, error_type)``.
+    '''
+
+    def __init__(self):
+        self.operations = {operation: OperationMetrics() for operation in OPERATIONS}
+        self.callbacks = []  # type: List[MetricsCallback]
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, duration: float, size: int = 0) -> None:
+        bucket = min(int(duration * 1e6).bit_length(), _HISTOGRAM_BUCKETS - 1)
+        with self._lock:
+            metrics = self.operations[operation]
+            metrics.calls += 1
+            metrics.size += size
+            metrics.histogram[bucket] += 1
+        for callback in self.callbacks:
+            callback(operation, duration, size, None)
+
+    def record_error(self, operation: str, exc: BaseException) -> None:
+        self.record_errors(operation, {type(exc).__name__: 1})
+
+    def record_errors(self, operation: str, errors: Dict[str, int]) -> None:
+        '''
+        Records ``count`` errors per exception class name, e.g. the failures summarized by a bulk operation.
+        '''
+        with self._lock:
+            self.operations[operation].errors.update(errors)
+        for error_type, count in errors.items():
+            for _ in range(count):
+                for callback in self.callbacks:
+                    callback(operation, 0.0, 0, error_type)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations = {operation: OperationMetrics() for operation in OPERATIONS}
+
+    def get_summary(self) -> Dict[str, Dict]:
+        '''
+        :return: per operation: calls, size (bytes, or entries for walks), errors (total and by type), p50 and p99 latency in seconds
+        '''
+        with self._lock:
+            return {
+                operation: {
+                    'calls': metrics.calls,
+                    'size': metrics.size,
+                    'errors': sum(metrics.errors.values()),
+                    'errors_by_type': dict(metrics.errors),
+                    'p50': metrics.get_percentile(50),
+                    'p99': metrics.get_percentile(99),
+                }
+                for operation, metrics in self.operations.items()
+            }
+
+
+GLOBAL_METRICS = MetricsRegistry()
+_active_registries = ()  # registries currently recording, empty while disabled
+_registry_lock = threading.Lock()
+
+
+def _set_active(registry: MetricsRegistry, active: bool) -> None:
+    global _active_registries
+    with _registry_lock:
+        registries = [item for item in _active_registries if item is not registry]
+        if active:
+            registries.append(registry)
+        _active_registries = tuple(registries)
+
+
+def enable_metrics() -> None:
+    '''
+    Starts recording into the global registry.
+    '''
+    _set_active(GLOBAL_METRICS, True)
+
+
+def disable_metrics() -> None:
+    '''
+    Stops recording into the global registry. Recorded values are kept.
+    '''
+    _set_active(GLOBAL_METRICS, False)
+
+
+def reset_metrics() -> None:
+    GLOBAL_METRICS.reset()
+
+
+def get_metrics_summary() -> Dict[str, Dict]:
+    '''
+    :return: summary of the global registry, see :meth:`MetricsRegistry.get_summary`
+    '''
+    return GLOBAL_METRICS.get_summary()
+
+
+def add_metrics_callback(callback: MetricsCallback) -> None:
+    '''
+    Registers an exporter called with ``(operation, duration, size, error_type)`` for every event recorded into the
+    global registry. ``error_type`` is the exception class name for errors and ``None`` otherwise.
+    '''
+    GLOBAL_METRICS.callbacks.append(callback)
+
+
+def remove_metrics_callback(callback: MetricsCallback) -> None:
+    GLOBAL_METRICS.callbacks.remove(callback)
+
+
+@contextmanager
+def profile_file_operations() -> Iterator[MetricsRegistry]:
+    '''
+    Records all file operations in the block into a separate registry, independent of the global one.
+    '''
+    registry = MetricsRegistry()
+    _set_active(registry, True)
+    try:
+        yield registry
+    finally:
+        _set_active(registry, False)
+
+
+def record_error(operation: str, exc: BaseException) -> None:
+    for registry in _active_registries:
+        registry.record_error(operation, exc)
+
+
+def instrumented(operation: str, get_size: Optional[Callable] = None, get_errors: Optional[Callable] = None) -> Callable:
+    '''
+    Decorator recording calls and latency of a function. ``get_size(result, args, kwargs)`` returns the
+    transferred bytes. ``get_errors(result)`` returns the number of errors per exception class name of functions
+    reporting their errors in the result instead of raising them (bulk operations).
+    '''
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _active_registries:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            duration = time.perf_counter() - start
+            size = get_size(result, args, kwargs) if get_size is not None else 0
+            errors = get_errors(result) if get_errors is not None else None
+            for registry in _active_registries:
+                registry.record(operation, duration, size)
+                if errors:
+                    registry.record_errors(operation, errors)
+            return result
+        return wrapper
+    return decorator
+
+
+def instrumented_generator(operation: str, get_size: Callable[[object], int]) -> Callable:
+    '''
+    Decorator for generator functions. Records one call per generator with the time spent in the generator (not in
+    its consumer) and the sum of ``get_size(item)`` over the yielded items.
+    '''
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _active_registries:
+                return function(*args, **kwargs)
+            return _instrument_generator(function(*args, **kwargs), 0.0, operation, get_size)
+        return wrapper
+    return decorator
+
+
+def instrumented_walk(function: Callable) -> Callable:
+    '''
+    Decorator for walks returning lists or generators. Records the time spent in the walk (not in the consumer of a
+    generator) and the number of entries.
+    '''
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _active_registries:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        if isinstance(result, list):
+            _record('walk', time.perf_counter() - start, len(result))
+            return result
+        return _instrument_generator(result, time.perf_counter() - start, 'walk', lambda _: 1)
+    return wrapper
+
+
+def _instrument_generator(generator: Iterator, duration: float, operation: str, get_size: Callable[[object], int]) -> Iterator:
+    size = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                duration += time.perf_counter() - start
+            size += get_size(item)
+            yield item
+    finally:
+        _record(operation, duration, size)
+
+
+def _record(operation: str, duration: float, size: int) -> None:
+    for registry in _active_registries:
+        registry.record(operation, duration, size)
@@ -0,0 +1,266 @@
+'''
+Compact file system snapshots for finding changes in large directory trees::
+
+    snapshot = take_snapshot('/some/extraction/root')
+    snapshot.save('root.snapshot')
+    ...
+    snapshot, diff = update_snapshot(FileSystemSnapshot.load('root.snapshot'))
+    print(diff.added, diff.removed, diff.modified)
+
+:func:`update_snapshot` only lists directories whose mtime changed since the previous snapshot. Files in unchanged
+directories are taken over from the previous snapshot unless ``check_files`` is set, so files that were modified in
+place (without being replaced) are only detected with ``check_files``.
+'''
+import logging
+import os
+import stat
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+ENTRY_FILE = 0
+ENTRY_DIRECTORY = 1
+ENTRY_SYMLINK = 2
+ENTRY_OTHER = 3
+
+_MAGIC = b'CHFSNAP1'
+_HEADER = struct.Struct('<?QqQ')  # little endian arrays, number of entries, root mtime_ns, length of the root path
+
+
+class SnapshotEntry(NamedTuple):
+    path: str
+    inode: int
+    size: int
+    mtime_ns: int
+    type: int
+
+
+class SnapshotDiff(NamedTuple):
+    added: List[str]
+    removed: List[str]
+    modified: List[str]
+
+
+class FileSystemSnapshot:
+    '''
+    Index of ``(path, inode, size, mtime_ns, type)`` for all entries of a directory tree. Paths are relative to
+    ``root``. The numeric columns are stored in ``array`` objects to keep the index compact.
+
+    :param root: root directory of the snapshot
+    :param root_mtime_ns: mtime of the root directory when the snapshot was taken
+    '''
+
+    def __init__(self, root: Union[str, Path], root_mtime_ns: int = -1):
+        self.root = str(Path(root).absolute())
+        self.root_mtime_ns = root_mtime_ns
+        self.paths = []  # type: List[str]
+        self.inodes = array('Q')
+        self.sizes = array('q')
+        self.mtimes_ns = array('q')
+        self.types = array('B')
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __iter__(self) -> Iterator[SnapshotEntry]:
+        for index, path in enumerate(self.paths):
+            yield SnapshotEntry(path, self.inodes[index], self.sizes[index], self.mtimes_ns[index], self.types[index])
+
+    def append(self, path: str, inode: int, size: int, mtime_ns: int, entry_type: int) -> None:
+        self.paths.append(path)
+        self.inodes.append(inode)
+        self.sizes.append(size)
+        self.mtimes_ns.append(mtime_ns)
+        self.types.append(entry_type)
+
+    def get_index(self) -> Dict[str, int]:
+        '''
+        :return: mapping of the paths to their position in the snapshot
+        '''
+        return {path: index for index, path in enumerate(self.paths)}
+
+    def save(self, file_path: Union[str, Path]) -> None:
+        '''
+        Stores the snapshot in a compact binary file (numeric columns as raw arrays, paths zlib compressed).
+        '''
+        root = os.fsencode(self.root)
+        paths = zlib.compress(b'\0'.join(os.fsencode(path) for path in self.paths), 1)
+        with open(str(file_path), 'wb') as file_object:
+            file_object.write(_MAGIC)
+            file_object.write(_HEADER.pack(sys.byteorder == 'little', len(self.paths), self.root_mtime_ns, len(root)))
+            file_object.write(root)
+            for column in (self.inodes, self.sizes, self.mtimes_ns, self.types):
+                file_object.write(column.tobytes())
+            file_object.write(paths)
+
+    @classmethod
+    def load(cls, file_path: Union[str, Path]) -> 'FileSystemSnapshot':
+        '''
+        Loads a snapshot stored with :meth:`save`. Raises a ``ValueError`` if the file is no snapshot.
+        '''
+        data = Path(file_path).read_bytes()
+        if not data.startswith(_MAGIC):
+            raise ValueError(f'{file_path} is no file system snapshot')
+        offset = len(_MAGIC)
+        little_endian, entry_count, root_mtime_ns, root_length = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        snapshot = cls(os.fsdecode(data[offset:offset + root_length]), root_mtime_ns)
+        offset += root_length
+        for column in (snapshot.inodes, snapshot.sizes, snapshot.mtimes_ns, snapshot.types):
+            column_length = entry_count * column.itemsize
+            column.frombytes(data[offset:offset + column_length])
+            offset += column_length
+            if little_endian != (sys.byteorder == 'little'):
+                column.byteswap()
+        if entry_count:
+            snapshot.paths = [os.fsdecode(path) for path in zlib.decompress(data[offset:]).split(b'\0')]
+        return snapshot
+
+
+def take_snapshot(directory_path: Union[str, Path]) -> FileSystemSnapshot:
+    '''
+    Fail-safe complete snapshot of a directory tree. Symlinks are recorded but not followed.
+    Errors are logged. No exception raised.
+
+    :param directory_path: root of the tree
+    :return: snapshot of the tree; an empty snapshot on error
+    '''
+    return _take_snapshot(directory_path, None, False)
+
+
+def update_snapshot(previous: FileSystemSnapshot, check_files: bool = False) -> Tuple[FileSystemSnapshot, SnapshotDiff]:
+    '''
+    Fail-safe incremental snapshot of the tree of ``previous``. Only directories whose mtime changed are listed again.
+    Errors are logged. No exception raised.
+
+    :param previous: earlier snapshot of the tree
+    :param check_files: stat files in unchanged directories to detect files modified in place
+    :default check_files: False
+    :return: the new snapshot and its differences to ``previous``
+    '''
+    snapshot = _take_snapshot(previous.root, previous, check_files)
+    return snapshot, diff_snapshots(previous, snapshot)
+
+
+def diff_snapshots(old: FileSystemSnapshot, new: FileSystemSnapshot) -> SnapshotDiff:
+    '''
+    :return: relative paths added, removed and modified (changed inode, size, mtime or type) between both snapshots
+    '''
+    old_index = old.get_index()
+    added, modified = [], []
+    for new_position, path in enumerate(new.paths):
+        old_position = old_index.pop(path, None)
+        if old_position is None:
+            added.append(path)
+        elif _get_record(old, old_position) != _get_record(new, new_position):
+            modified.append(path)
+    return SnapshotDiff(added, sorted(old_index, key=old_index.get), modified)
+
+
+def _get_record(snapshot: FileSystemSnapshot, index: int) -> Tuple[int, int, int, int]:
+    return snapshot.inodes[index], snapshot.sizes[index], snapshot.mtimes_ns[index], snapshot.types[index]
+
+
+def _take_snapshot(directory_path: Union[str, Path], previous: Optional[FileSystemSnapshot], check_files: bool) -> FileSystemSnapshot:
+    try:
+        root_stat = os.stat(str(directory_path))
+        snapshot = FileSystemSnapshot(directory_path, root_stat.st_mtime_ns)
+        _Walker(snapshot, previous, check_files).walk(root_stat)
+        return snapshot
+    except Exception as exc:
+        logging.error(f'Could not take snapshot: {exc}', exc_info=True)
+        return FileSystemSnapshot(directory_path)
+
+
+class _Walker:
+    def __init__(self, snapshot: FileSystemSnapshot, previous: Optional[FileSystemSnapshot], check_files: bool):
+        self.snapshot = snapshot
+        self.previous = previous
+        self.check_files = check_files
+        self.previous_index = previous.get_index() if previous is not None else {}
+        self.previous_children = _get_children(previous) if previous is not None else {}
+
+    def walk(self, root_stat: os.stat_result) -> None:
+        root_unchanged = self.previous is not None and self.previous.root_mtime_ns == root_stat.st_mtime_ns
+        stack = [('', root_unchanged)]
+        while stack:
+            directory, unchanged = stack.pop()
+            sub_directories = None
+            if unchanged:
+                sub_directories = self._reuse_directory(directory)
+            if sub_directories is None:
+                sub_directories = self._scan_directory(directory)
+            stack.extend(reversed(sub_directories))
+
+    def _scan_directory(self, directory: str) -> List[Tuple[str, bool]]:
+        sub_directories = []
+        try:
+            with os.scandir(os.path.join(self.snapshot.root, directory)) as iterator:
+                entries = list(iterator)
+        except OSError as exc:
+            logging.warning(f'Could not list directory {directory}: {exc}')
+            return sub_directories
+        for entry in entries:
+            path = os.path.join(directory, entry.name)
+            try:
+                entry_stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue  # removed in the meantime
+            if self._record(path, entry_stat):
+                sub_directories.append((path, self._is_unchanged_directory(path, entry_stat)))
+        return sub_directories
+
+    def _reuse_directory(self, directory: str) -> Optional[List[Tuple[str, bool]]]:
+        # returns None if the directory must be listed again
+        records = []
+        for previous_position in self.previous_children.get(directory, []):
+            path = self.previous.paths[previous_position]
+            if self.previous.types[previous_position] == ENTRY_DIRECTORY or self.check_files:
+                try:
+                    entry_stat = os.lstat(os.path.join(self.snapshot.root, path))
+                except OSError:
+                    return None  # removed within the mtime granularity
+                records.append((path, entry_stat, None))
+            else:
+                records.append((path, None, previous_position))
+        sub_directories = []
+        for path, entry_stat, previous_position in records:
+            if entry_stat is None:
+                self.snapshot.append(path, *_get_record(self.previous, previous_position))
+            elif self._record(path, entry_stat):
+                sub_directories.append((path, self._is_unchanged_directory(path, entry_stat)))
+        return sub_directories
+
+    def _record(self, path: str, entry_stat: os.stat_result) -> bool:
+        entry_type = _get_entry_type(entry_stat.st_mode)
+        self.snapshot.append(path, entry_stat.st_ino, entry_stat.st_size, entry_stat.st_mtime_ns, entry_type)
+        return entry_type == ENTRY_DIRECTORY
+
+    def _is_unchanged_directory(self, path: str, entry_stat: os.stat_result) -> bool:
+        previous_position = self.previous_index.get(path)
+        return (
+            previous_position is not None
+            and self.previous.types[previous_position] == ENTRY_DIRECTORY
+            and self.previous.inodes[previous_position] == entry_stat.st_ino
+            and self.previous.mtimes_ns[previous_position] == entry_stat.st_mtime_ns
+        )
+
+
+def _get_children(snapshot: FileSystemSnapshot) -> Dict[str, List[int]]:
+    children = {}
+    for index, path in enumerate(snapshot.paths):
+        children.setdefault(os.path.dirname(path), []).append(index)
+    return children
+
+
+def _get_entry_type(mode: int) -> int:
+    if stat.S_ISREG(mode):
+        return ENTRY_FILE
+    if stat.S_ISDIR(mode):
+        return ENTRY_DIRECTORY
+    if stat.S_ISLNK(mode):
+        return ENTRY_SYMLINK
+    return ENTRY_OTHER
@@ -0,0 +1,209 @@
+'''
+Process pool map for CPU-bound work on file contents (entropy, string extraction, signature scans, ...)::
+
+    for result in map_files_in_dir(get_entropy, '/some/extraction/root'):
+        if result.error is None:
+            print(result.path, result.result)
+
+Only paths are sent to the worker processes. The files are read by the workers themselves and only the (usually
+small) results are sent back. The paths are grouped into batches of similar total file size, so each task carries a
+comparable amount of work and the inter-process overhead is paid per batch instead of per file. The function must be
+picklable, i.e. defined at module level.
+'''
+import logging
+import os
+import signal
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .fail_safe_file_operations import safe_scandir
+
+DEFAULT_BATCH_BYTES = 16 * 1024 * 1024
+DEFAULT_BATCH_FILES = 256
+
+
+class FileResult(NamedTuple):
+    path: str
+    result: Any  # None if an error occurred
+    error: Optional[str]  # 'ExceptionType: message' or None
+
+
+def map_files(function: Callable[[Union[str, bytes]], Any], file_paths: Iterable[Union[str, Path]], workers: Optional[int] = None, ordered: bool = False, timeout: Optional[float] = None, batch_bytes: int = DEFAULT_BATCH_BYTES, batch_files: int = DEFAULT_BATCH_FILES) -> Iterator[FileResult]:
+    '''
+    Fail-safe parallel map of ``function`` over the contents of files on a process pool. The contents are read as by
+    :func:`get_binary_from_file` (symbolic links are converted to text including the link). Results are streamed:
+    a batch is yielded as soon as it is processed, while more batches are still pending.
+    Errors (reading, ``function``, timeouts, crashed workers) are logged and returned in ``FileResult.error``.
+    No exception raised.
+
+    :param function: picklable function called with the content of each file
+    :param file_paths: paths of the files. Can be absolute or relative to the current directory.
+    :param workers: number of processes
+    :default workers: number of CPUs
+    :param ordered: yield results in input order. Otherwise batches are yielded as soon as they are done.
+    :default ordered: False
+    :param timeout: maximum seconds per file (needs ``signal.SIGALRM``, ignored on other platforms). Long running
+        calls into C code are only interrupted once they return to Python.
+    :default timeout: None
+    :param batch_bytes: total file size per batch
+    :default batch_bytes: 16 MiB
+    :param batch_files: maximum number of files per batch
+    :default batch_files: 256
+    :return: generator of ``FileResult(path, result, error)`` tuples
+    '''
+    sized_paths = ((os.fspath(file_path), _get_file_size(file_path)) for file_path in file_paths)
+    return _map_batches(function, _get_balanced_batches(sized_paths, batch_bytes, batch_files), workers or os.cpu_count() or 1, ordered, timeout)
+
+
+def map_files_in_dir(function: Callable[[Union[str, bytes]], Any], directory_path: Union[str, Path], include_symlinks: bool = False, workers: Optional[int] = None, ordered: bool = False, timeout: Optional[float] = None, batch_bytes: int = DEFAULT_BATCH_BYTES, batch_files: int = DEFAULT_BATCH_FILES) -> Iterator[FileResult]:
+    '''
+    :func:`map_files` over all files in a directory tree, walked with :func:`safe_scandir`. Processing starts while
+    the tree is still being walked.
+
+    :param include_symlinks: also map symlinks pointing to files or directories (see :func:`safe_rglob`)
+    :default include_symlinks: False
+    '''
+    sized_paths = (
+        (entry.path, _get_entry_size(entry))
+        for entry in safe_scandir(directory_path, include_symlinks=include_symlinks, include_directories=False)
+    )
+    return _map_batches(function, _get_balanced_batches(sized_paths, batch_bytes, batch_files), workers or os.cpu_count() or 1, ordered, timeout)
+
+
+def _get_file_size(file_path: Union[str, Path]) -> int:
+    try:
+        return os.lstat(file_path).st_size
+    except OSError:
+        return 0  # the worker reports the error
+
+
+def _get_entry_size(entry: os.DirEntry) -> int:
+    try:
+        return entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        return 0
+
+
+def _get_balanced_batches(sized_paths: Iterable[Tuple[str, int]], batch_bytes: int, batch_files: int) -> Iterator[List[str]]:
+    batch, size = [], 0
+    for path, file_size in sized_paths:
+        batch.append(path)
+        size += file_size
+        if size >= batch_bytes or len(batch) >= batch_files:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def _map_batches(function: Callable, batches: Iterator[List[str]], workers: int, ordered: bool, timeout: Optional[float]) -> Iterator[FileResult]:
+    max_pending = 2 * workers
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    pending.append((batch, _submit(executor, function, batch, timeout)))
+            if not pending:
+                break
+            if ordered:
+                batch, future = pending.popleft()
+            else:
+                wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                batch, future = next(item for item in pending if item[1].done())
+                pending.remove((batch, future))
+            try:
+                results = future.result()
+            except BrokenProcessPool:  # a worker died (crash, out of memory, ...) and took all pending batches with it
+                executor, results = _retry_batch(executor, workers, function, batch, timeout)
+                pending = deque(
+                    (other_batch, other_future) if other_future.done() and other_future.exception() is None
+                    else (other_batch, _submit(executor, function, other_batch, timeout))
+                    for other_batch, other_future in pending
+                )
+            except Exception as exc:  # e.g. results that cannot be pickled
+                results = [FileResult(path, None, _format_error(exc)) for path in batch]
+            for result in results:
+                if result.error is not None:
+                    logging.error(f'Could not process file {result.path}: {result.error}')
+                yield result
+    finally:
+        _shutdown(executor)
+
+
+def _submit(executor: ProcessPoolExecutor, function: Callable, batch: List[str], timeout: Optional[float]) -> Future:
+    try:
+        return executor.submit(_process_batch, function, batch, timeout)
+    except BrokenProcessPool as exc:  # broken before the failed batch was collected, handled like a failed batch
+        future = Future()
+        future.set_exception(exc)
+        return future
+
+
+def _retry_batch(executor: ProcessPoolExecutor, workers: int, function: Callable, batch: List[str], timeout: Optional[float]) -> Tuple[ProcessPoolExecutor, List[FileResult]]:
+    # the batch is retried alone to tell the batch that crashed the worker apart from those that ran next to it
+    _shutdown(executor)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        return executor, executor.submit(_process_batch, function, batch, timeout).result()
+    except BrokenProcessPool as exc:
+        _shutdown(executor)
+        return ProcessPoolExecutor(max_workers=workers), [FileResult(path, None, _format_error(exc)) for path in batch]
+
+
+def _shutdown(executor: ProcessPoolExecutor) -> None:
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        executor.shutdown(wait=True)
+
+
+def _format_error(exc: BaseException) -> str:
+    return f'{type(exc).__name__}: {exc}'
+
+
+def _process_batch(function: Callable, paths: List[str], timeout: Optional[float]) -> List[FileResult]:
+    # runs in the worker process
+    use_timeout = timeout is not None and hasattr(signal, 'SIGALRM')
+    if use_timeout:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    try:
+        results = []
+        for path in paths:
+            try:
+                if use_timeout:
+                    signal.setitimer(signal.ITIMER_REAL, timeout)
+                try:
+                    result = function(_read_file(path))
+                finally:
+                    if use_timeout:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+            except Exception as exc:
+                results.append(FileResult(path, None, _format_error(exc)))
+            else:
+                results.append(FileResult(path, result, None))
+        return results
+    finally:
+        if use_timeout:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _raise_timeout(*_):
+    raise TimeoutError('processing the file took too long')
+
+
+def _read_file(path: str) -> Union[str, bytes]:
+    # like get_binary_from_file, but errors are raised to be reported with the result
+    if os.path.islink(path):
+        return f'symbolic link -> {os.readlink(path)}'
+    with open(path, 'rb') as file_object:
+        return file_object.read()
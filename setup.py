@@ -6,10 +6,10 @@ setup(
     name='common_helper_files',
     version=VERSION,
     packages=find_packages(),
-    install_requires=[
-        'bitmath'
-    ],
     extras_require={
+        'bitmath': [
+            'bitmath'
+        ],
         'dev': [
             'pytest',
             'pytest-pycodestyle',
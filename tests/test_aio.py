@@ -0,0 +1,64 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from common_helper_files import (
+    aio, create_symlink, delete_file, get_binary_from_file, get_files_in_dir, safe_rglob, write_binary_to_file
+)
+
+TEST_DATA_DIR = Path(__file__).absolute().parent / 'data'
+
+
+async def _collect(async_iterator):
+    return [item async for item in async_iterator]
+
+
+@pytest.mark.parametrize('file_name', ['read_test', 'link_test', 'none_existing_file'])
+def test_get_binary_from_file(file_name):
+    assert asyncio.run(aio.get_binary_from_file(TEST_DATA_DIR / file_name)) == get_binary_from_file(TEST_DATA_DIR / file_name)
+
+
+def test_write_and_delete(tmp_path):
+    sync_path, async_path = tmp_path / 'sync' / 'file', tmp_path / 'async' / 'file'
+    for content, kwargs in [(b'first', {}), (b'second', {}), (b'third', {'overwrite': True}), (b'fourth', {'file_copy': True})]:
+        write_binary_to_file(content, sync_path, **kwargs)
+        asyncio.run(aio.write_binary_to_file(content, async_path, **kwargs))
+    assert sorted(os.listdir(str(async_path.parent))) == sorted(os.listdir(str(sync_path.parent))) == ['file', 'file-1']
+    assert async_path.read_bytes() == sync_path.read_bytes() == b'third'
+    with pytest.raises(ValueError):
+        asyncio.run(aio.write_binary_to_file(b'', async_path, overwrite=True, file_copy=True))
+    for _ in range(2):  # the second call hits a missing file
+        delete_file(sync_path)
+        asyncio.run(aio.delete_file(async_path))
+    assert not async_path.exists() and not sync_path.exists()
+    assert sorted(os.listdir(str(async_path.parent))) == sorted(os.listdir(str(sync_path.parent))) == ['file-1']
+
+
+def test_create_symlink(tmp_path):
+    create_symlink('target', tmp_path / 'sync' / 'link')
+    asyncio.run(aio.create_symlink('target', tmp_path / 'async' / 'link'))
+    asyncio.run(aio.create_symlink('target', tmp_path / 'async' / 'link'))
+    assert os.readlink(str(tmp_path / 'async' / 'link')) == os.readlink(str(tmp_path / 'sync' / 'link'))
+
+
+def test_get_files_in_dir():
+    assert asyncio.run(aio.get_files_in_dir(TEST_DATA_DIR)) == get_files_in_dir(TEST_DATA_DIR)
+    assert asyncio.run(aio.get_files_in_dir('/none_existing/dir')) == []
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 256])
+def test_safe_rglob(batch_size):
+    assert asyncio.run(_collect(aio.safe_rglob(TEST_DATA_DIR, batch_size=batch_size))) == list(safe_rglob(TEST_DATA_DIR))
+    assert asyncio.run(_collect(aio.safe_rglob(Path('foo', 'bar')))) == []
+
+
+def test_concurrent_calls():
+    aio.set_max_workers(2)
+    try:
+        async def read_many():
+            return await asyncio.gather(*(aio.get_binary_from_file(TEST_DATA_DIR / 'read_test') for _ in range(20)))
+        assert asyncio.run(read_many()) == 20 * [b'this is a test']
+    finally:
+        aio.set_max_workers(aio.DEFAULT_MAX_WORKERS)
@@ -0,0 +1,212 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from common_helper_files import bulk_file_operations
+from common_helper_files import copy_tree, create_symlinks, delete_files, delete_tree, get_binaries_from_files, get_binary_from_file
+
+TEST_DATA_DIR = Path(__file__).absolute().parent / 'data'
+
+
+@pytest.fixture(scope='function')
+def test_files():
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        paths = []
+        for index in range(50):
+            path = Path(tmp_dir, f'file_{index}')
+            path.write_bytes(index * b'x')
+            paths.append(path)
+        yield paths
+
+
+@pytest.mark.parametrize('workers, max_in_flight_bytes', [(1, 1), (4, 10), (8, 64 * 1024 * 1024)])
+def test_get_binaries_from_files(test_files, workers, max_in_flight_bytes):
+    result = list(get_binaries_from_files(test_files, workers=workers, max_in_flight_bytes=max_in_flight_bytes))
+    assert result == [(path, get_binary_from_file(path)) for path in test_files]
+
+
+@pytest.mark.parametrize('max_in_flight_bytes, expected_reads', [(1, 1), (2500, 2), (64 * 1024 * 1024, 8)])
+def test_get_binaries_from_files_budget(tmp_path, monkeypatch, max_in_flight_bytes, expected_reads):
+    paths = []
+    for index in range(10):
+        paths.append(tmp_path / str(index))
+        paths[-1].write_bytes(1000 * b'x')
+    submitted = []
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, function, *args, **kwargs):
+            submitted.append(args)
+            return super().submit(function, *args, **kwargs)
+
+    monkeypatch.setattr(bulk_file_operations, 'ThreadPoolExecutor', CountingExecutor)
+    results = get_binaries_from_files(paths, workers=4, max_in_flight_bytes=max_in_flight_bytes)
+    assert next(results) == (paths[0], 1000 * b'x')
+    assert len(submitted) == expected_reads  # running reads count against the budget
+    assert len(list(results)) == 9
+
+
+def test_get_binaries_from_files_unordered(test_files):
+    result = list(get_binaries_from_files(iter(test_files), workers=4, ordered=False))
+    assert sorted(result) == sorted((path, get_binary_from_file(path)) for path in test_files)
+
+
+def test_get_binaries_from_files_errors():
+    paths = [TEST_DATA_DIR / 'read_test', TEST_DATA_DIR / 'none_existing_file', str(TEST_DATA_DIR / 'link_test')]
+    result = list(get_binaries_from_files(paths))
+    assert result == [(paths[0], b'this is a test'), (paths[1], b''), (paths[2], 'symbolic link -> read_test')]
+    assert list(get_binaries_from_files([])) == []
+
+
+def _create_tree(root: Path):
+    for directory in ['a/b/c', 'a/d', 'e']:
+        (root / directory).mkdir(parents=True)
+    for index in range(30):
+        (root / 'a' / 'b' / 'c' / str(index)).write_bytes(b'')
+        (root / 'e' / str(index)).write_bytes(b'')
+    (root / 'file').write_bytes(b'')
+
+
+def test_delete_files(test_files):
+    summary = delete_files(test_files[:40] + [Path('/none_existing/file')], workers=4, batch_size=7)
+    assert (summary.deleted, summary.failed) == (40, 1)
+    assert summary.errors == {'FileNotFoundError': 1}
+    assert [path for path in test_files if path.exists()] == test_files[40:]
+
+
+def test_delete_files_relative_path(test_files, monkeypatch):
+    monkeypatch.chdir(test_files[0].parent)
+    assert delete_files([test_files[0].name]).deleted == 1
+    assert not test_files[0].exists()
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_delete_tree(workers):
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        root = Path(tmp_dir, 'root')
+        _create_tree(root)
+        summary = delete_tree(root, workers=workers)
+        assert summary == (67, 0, {})
+        assert not root.exists()
+
+
+def test_delete_tree_counts_only_real_failures(tmp_path, monkeypatch):
+    (tmp_path / 'root' / 'a' / 'b' / 'locked').mkdir(parents=True)
+    (tmp_path / 'root' / 'a' / 'b' / 'locked' / 'file').write_bytes(b'content')
+    (tmp_path / 'root' / 'a' / 'other').mkdir()
+    (tmp_path / 'root' / 'a' / 'other' / 'busy').write_bytes(b'content')
+    (tmp_path / 'root' / 'a' / 'other' / 'file').write_bytes(b'content')
+    original_open, original_unlink = os.open, os.unlink
+
+    def open_directory(path, *args, **kwargs):
+        if path == 'locked':
+            raise PermissionError(13, 'Permission denied', path)
+        return original_open(path, *args, **kwargs)
+
+    def unlink(path, *args, **kwargs):
+        if path == 'busy':
+            raise OSError(16, 'Device or resource busy', path)
+        return original_unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'supports_dir_fd', os.supports_dir_fd | {open_directory, unlink})
+    monkeypatch.setattr(os, 'open', open_directory)
+    monkeypatch.setattr(os, 'unlink', unlink)
+    summary = delete_tree(tmp_path / 'root', workers=2)
+    assert summary == (1, 2, {'PermissionError': 1, 'OSError': 1})
+    assert sorted(str(path.relative_to(tmp_path)) for path in tmp_path.rglob('*')) == [
+        'root', 'root/a', 'root/a/b', 'root/a/b/locked', 'root/a/b/locked/file', 'root/a/other', 'root/a/other/busy'
+    ]
+
+
+def test_delete_tree_does_not_follow_symlinks():
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        outside, root = Path(tmp_dir, 'outside'), Path(tmp_dir, 'root')
+        _create_tree(outside)
+        root.mkdir()
+        (root / 'link').symlink_to(outside)
+        (root / 'a').mkdir()
+        (root / 'a' / 'file_link').symlink_to(outside / 'file')
+        assert delete_tree(root, remove_root=False) == (3, 0, {})
+        assert root.exists() and not any(root.iterdir())
+        assert (outside / 'file').exists() and len(list(outside.rglob('*'))) == 66
+
+        (root / 'link').symlink_to(outside)
+        summary = delete_tree(root / 'link')
+        assert (summary.deleted, summary.failed) == (0, 1)
+        assert (root / 'link').is_symlink()
+        assert delete_tree(Path(tmp_dir, 'none_existing')).failed == 1
+
+
+@pytest.mark.parametrize('relative', [False, True])
+def test_create_symlinks(test_files, relative, monkeypatch):
+    link_dir = test_files[0].parent / 'links'
+    pairs = [(path, link_dir / str(index % 3) / path.name) for index, path in enumerate(test_files)]
+    created_dirs = []
+    original_makedirs = os.makedirs
+    monkeypatch.setattr(os, 'makedirs', lambda path, **kwargs: created_dirs.append(path) or original_makedirs(path, **kwargs))
+    summary = create_symlinks(pairs, workers=4, relative=relative, batch_size=7)
+    assert summary == (50, [], 0, {})
+    assert sorted(created_dirs) == sorted([str(link_dir)] + [str(link_dir / str(index)) for index in range(3)])
+    for src_path, dst_path in pairs:
+        assert dst_path.read_bytes() == src_path.read_bytes()
+        assert os.path.isabs(os.readlink(str(dst_path))) != relative
+
+    summary = create_symlinks(pairs[:2] + [(test_files[0], test_files[1] / 'not_a_dir' / 'link')])
+    assert (summary.created, summary.failed) == (0, 1)
+    assert summary.existing == [str(dst_path) for _, dst_path in pairs[:2]]
+
+
+def test_copy_tree(tmp_path):
+    src = tmp_path / 'src'
+    (src / 'a' / 'b').mkdir(parents=True)
+    (src / 'file').write_bytes(b'root file')
+    (src / 'a' / 'b' / 'deep').write_bytes(b'deep file')
+    (src / 'a' / 'link').symlink_to('b/deep')
+    (src / 'a' / 'broken').symlink_to('none_existing')
+    os.chmod(str(src / 'a' / 'b'), 0o750)
+    os.utime(str(src / 'a'), ns=(1_000_000_000, 2_000_000_000))
+    dst = tmp_path / 'dst'
+    assert copy_tree(src, dst, workers=2, batch_size=1) == (4, [], 0, {})
+    assert (dst / 'file').read_bytes() == b'root file'
+    assert (dst / 'a' / 'link').read_bytes() == b'deep file'
+    assert os.readlink(str(dst / 'a' / 'broken')) == 'none_existing'
+    assert oct((dst / 'a' / 'b').stat().st_mode & 0o777) == oct(0o750)
+    assert (dst / 'a').stat().st_mtime_ns == 2_000_000_000
+
+    (src / 'file').write_bytes(b'changed')
+    summary = copy_tree(src, dst)
+    assert (summary.copied, sorted(summary.existing)) == (0, sorted(str(dst / path) for path in ['file', 'a/b/deep', 'a/link', 'a/broken']))
+    assert copy_tree(src, dst, overwrite=True).copied == 4
+    assert (dst / 'file').read_bytes() == b'changed'
+    assert copy_tree(src, dst, file_copy=True).copied == 4
+    assert (dst / 'file-1').read_bytes() == b'changed'
+
+
+def test_copy_tree_into_itself(tmp_path):
+    (tmp_path / 'file').write_bytes(b'content')
+    summary = copy_tree(tmp_path, tmp_path / 'copy')
+    assert summary == (1, [], 0, {})
+    assert sorted(os.listdir(str(tmp_path / 'copy'))) == ['file']
+
+
+def test_copy_tree_unreadable_directory(tmp_path, monkeypatch):
+    (tmp_path / 'src' / 'locked').mkdir(parents=True)
+    (tmp_path / 'src' / 'file').write_bytes(b'content')
+    (tmp_path / 'src' / 'locked' / 'hidden').write_bytes(b'content')
+    original_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == 'locked':
+            raise PermissionError(13, 'Permission denied', path)
+        return original_scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+    assert copy_tree(tmp_path / 'src', tmp_path / 'dst') == (1, [], 1, {'PermissionError': 1})
+
+
+def test_copy_tree_errors(tmp_path):
+    assert copy_tree(tmp_path / 'none_existing', tmp_path / 'copy').failed == 1
+    with pytest.raises(ValueError):
+        copy_tree(tmp_path, tmp_path / 'copy', overwrite=True, file_copy=True)
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from common_helper_files import find_duplicate_files, link_duplicates
+from common_helper_files import duplicate_files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    large = os.urandom(300 * 1024)
+    files = {
+        'a/small': b'same content',
+        'b/small': b'same content',
+        'c/small_other': b'same_content',  # same size, different content
+        'a/large': large,
+        'b/c/large': large,
+        'a/large_other': large[:150 * 1024] + bytes([large[150 * 1024] ^ 0xff]) + large[150 * 1024 + 1:],  # head and tail identical
+        'unique': b'unique size',
+        'empty_1': b'',
+        'empty_2': b'',
+    }
+    for name, content in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    os.link(str(tmp_path / 'a' / 'large'), str(tmp_path / 'hardlink'))
+    (tmp_path / 'symlink').symlink_to(tmp_path / 'a' / 'small')
+    (tmp_path / 'broken').symlink_to(tmp_path / 'none_existing')
+    return tmp_path
+
+
+def _relative(groups, root):
+    return [[os.path.relpath(path, str(root)) for path in group.paths] for group in groups]
+
+
+def test_find_duplicate_files(tree):
+    groups = find_duplicate_files(tree)
+    assert _relative(groups, tree) == [['a/large', 'b/c/large'], ['a/small', 'b/small']]
+    assert [group.size for group in groups] == [300 * 1024, 12]
+    assert groups[1].digest == duplicate_files.get_file_digest(tree / 'b' / 'small')
+
+
+def test_find_duplicate_files_options(tree):
+    assert _relative(find_duplicate_files(tree, include_symlinks=True, workers=1), tree) == [['a/large', 'b/c/large'], ['a/small', 'b/small']]
+    assert _relative(find_duplicate_files(tree, min_size=0, block_size=4), tree) == [['a/large', 'b/c/large'], ['a/small', 'b/small'], ['empty_1', 'empty_2']]
+    assert find_duplicate_files(tree / 'none_existing') == []
+
+
+def test_find_duplicate_files_reads_little(tree, monkeypatch):
+    read_files = []
+    original_get_file_digest = duplicate_files.get_file_digest
+
+    def get_file_digest(path, *args):
+        read_files.append(os.path.relpath(path, str(tree)))
+        return original_get_file_digest(path, *args)
+    monkeypatch.setattr(duplicate_files, 'get_file_digest', get_file_digest)
+    find_duplicate_files(tree)
+    assert sorted(read_files) == ['a/large', 'a/large_other', 'b/c/large']
+
+
+@pytest.mark.parametrize('link_type, relative', [('hardlink', False), ('symlink', False), ('symlink', True)])
+def test_link_duplicates(tree, link_type, relative):
+    groups = find_duplicate_files(tree)
+    assert link_duplicates(groups, link_type=link_type, relative=relative) == 2
+    assert find_duplicate_files(tree) == []
+    for original, duplicate in (('a/large', 'b/c/large'), ('a/small', 'b/small')):
+        assert os.path.samefile(str(tree / original), str(tree / duplicate))
+        assert (tree / duplicate).is_symlink() == (link_type == 'symlink')
+        if relative:
+            assert not Path(os.readlink(str(tree / duplicate))).is_absolute()
+    assert sorted(path.name for path in (tree / 'b').iterdir()) == ['c', 'small']  # no temporary files left
+    assert link_duplicates(groups, link_type=link_type) == 0  # already linked
+
+
+def test_link_duplicates_errors(tree):
+    groups = find_duplicate_files(tree)
+    assert link_duplicates(groups, link_type='copy') == 0
+    (tree / 'b' / 'small').write_bytes(b'changed')
+    assert link_duplicates(groups) == 1
+    assert (tree / 'b' / 'small').read_bytes() == b'changed'
@@ -1,14 +1,19 @@
+import errno
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
 import pytest
 
 from common_helper_files import (
-    create_symlink, delete_file, get_safe_name, get_binary_from_file, get_dir_of_file, get_directory_for_filename,
-    get_dirs_in_dir, get_files_in_dir, get_string_list_from_file, safe_rglob, write_binary_to_file
+    copy_file, create_symlink, delete_file, get_safe_name, get_safe_names, get_binary_from_file, get_dir_of_file, get_directory_for_filename,
+    get_dirs_in_dir, get_files_in_dir, get_string_list_from_file, iter_dirs_in_dir, iter_files_in_dir,
+    iter_lines_from_file, safe_rglob, safe_scandir, write_binary_to_file
 )
-from common_helper_files.fail_safe_file_operations import _get_counted_file_path
+from common_helper_files import fail_safe_file_operations
+from common_helper_files.fail_safe_file_operations import _CountedFilePathIndex, _split_file_counter
 
 TEST_DATA_DIR = Path(__file__).absolute().parent / 'data'
 EMPTY_FOLDER = TEST_DATA_DIR / 'empty_folder'
@@ -61,12 +66,60 @@ def test_fail_safe_read_file():
     assert file_binary == 'symbolic link -> read_test'
 
 
+def test_fail_safe_read_file_memory_map(tempdir):
+    with get_binary_from_file(TEST_DATA_DIR / 'read_test', memory_map=True) as mapped_file:
+        assert not isinstance(mapped_file, bytes)
+        assert mapped_file[:] == b'this is a test'
+        assert memoryview(mapped_file).readonly
+    empty_file = Path(tempdir.name, 'empty')
+    empty_file.write_bytes(b'')
+    assert get_binary_from_file(empty_file, memory_map=True) == b''
+    assert get_binary_from_file(os.devnull, memory_map=True) == b''
+    assert get_binary_from_file(TEST_DATA_DIR / 'link_test', memory_map=True) == 'symbolic link -> read_test'
+    assert get_binary_from_file(TEST_DATA_DIR / 'none_existing_file', memory_map=True) == b''
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('empty', b''),
+    (os.devnull, b''),
+    (TEST_DATA_DIR / 'link_test', 'symbolic link -> read_test'),
+    (TEST_DATA_DIR / 'none_existing_file', b''),
+])
+def test_fail_safe_read_file_memory_map_is_closable(tempdir, path, expected):
+    Path(tempdir.name, 'empty').write_bytes(b'')
+    with get_binary_from_file(Path(tempdir.name, path), memory_map=True) as binary:
+        assert binary == expected
+        assert type(expected) in type(binary).__mro__
+    binary.close()
+
+
 def test_fail_safe_read_file_string_list():
     test_file_path = os.path.join(get_directory_of_current_file(), "data", "multiline_test.txt")
     lines = get_string_list_from_file(test_file_path)
     assert lines == ['first line', 'second line', 'th\ufffdrd line', '', 'first line'], "lines not correct"
 
 
+@pytest.mark.parametrize('content', [
+    b'', b'\n', b'a', b'a\n', b'\r\n\r\n', b'a\rb\r\nc\r', 'ä€😀\r\nx'.encode() + b'\xff\xfe\xe2\x82\n\xf0\x9f', bytes(range(256)) * 3,
+])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 65536])
+def test_iter_lines_from_file(tempdir, content, chunk_size):
+    file_path = Path(tempdir.name, 'test_file')
+    file_path.write_bytes(content)
+    assert list(iter_lines_from_file(file_path, chunk_size=chunk_size)) == get_string_list_from_file(file_path)
+
+
+def test_iter_lines_from_file_limits(tempdir):
+    file_path = Path(tempdir.name, 'test_file')
+    file_path.write_bytes(b'short\r\n' + 100 * b'long' + b'\nlast')
+    assert list(iter_lines_from_file(file_path, chunk_size=5, max_line_length=6)) == ['short', 'longlo', 'last']
+    assert list(iter_lines_from_file(file_path, max_lines=2)) == ['short', 100 * 'long']
+    assert list(iter_lines_from_file(file_path, max_lines=0)) == []
+    assert list(iter_lines_from_file(TEST_DATA_DIR / 'multiline_test.txt')) == get_string_list_from_file(TEST_DATA_DIR / 'multiline_test.txt')
+    assert list(iter_lines_from_file(TEST_DATA_DIR / 'none_existing_file')) == get_string_list_from_file(TEST_DATA_DIR / 'none_existing_file')
+    assert list(iter_lines_from_file(TEST_DATA_DIR / 'link_test')) == ['symbolic link -> read_test']
+
+
 def test_fail_safe_write_file(tempdir):
     file_path = os.path.join(tempdir.name, "test_folder", "test_file")
     write_binary_to_file(b'this is a test', file_path)
@@ -90,10 +143,143 @@ def test_fail_safe_write_file(tempdir):
     assert read_binary_new == b'second_overwrite', "binary of new file not correct"
 
 
-def test_get_counted_file_path():
-    assert _get_counted_file_path("/foo/bar") == "/foo/bar-1", "simple case"
-    assert _get_counted_file_path("/foo/bar-11") == "/foo/bar-12", "simple count two digits"
-    assert _get_counted_file_path("foo-34/bar") == "foo-34/bar-1", "complex case"
+@pytest.mark.parametrize('fsync', [False, True])
+def test_fail_safe_write_file_atomic(tempdir, fsync):
+    file_path = Path(tempdir.name, 'test_folder', 'test_file')
+    write_binary_to_file(b'first', file_path, atomic=True, fsync=fsync)
+    write_binary_to_file(b'not written', file_path, atomic=True, fsync=fsync)
+    assert file_path.read_bytes() == b'first'
+    write_binary_to_file(b'overwrite', file_path, overwrite=True, atomic=True, fsync=fsync)
+    assert file_path.read_bytes() == b'overwrite'
+    write_binary_to_file(b'copy 1', file_path, file_copy=True, atomic=True, fsync=fsync)
+    write_binary_to_file(b'copy 2', file_path, file_copy=True, atomic=True, fsync=fsync)
+    assert Path(f'{file_path}-1').read_bytes() == b'copy 1'
+    assert Path(f'{file_path}-2').read_bytes() == b'copy 2'
+    assert sorted(os.listdir(str(file_path.parent))) == ['test_file', 'test_file-1', 'test_file-2'], 'temporary files left'
+
+
+def test_fail_safe_write_file_atomic_concurrent_copies(tempdir):
+    file_path = Path(tempdir.name, 'test_file')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda index: write_binary_to_file(str(index).encode(), file_path, file_copy=True, atomic=True), range(40)))
+    contents = sorted(int(path.read_bytes()) for path in file_path.parent.iterdir())
+    assert contents == list(range(40)), 'a copy was clobbered'
+
+
+def test_fail_safe_write_file_atomic_error(tempdir):
+    write_binary_to_file('no bytes', Path(tempdir.name, 'test_file'), atomic=True)
+    assert os.listdir(tempdir.name) == []
+
+
+def test_fail_safe_write_file_many_copies(tempdir, monkeypatch):
+    file_path = Path(tempdir.name, 'test_file')
+    Path(tempdir.name, 'test_file-7').write_bytes(b'existing copy')
+    scanned = []
+    original_listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir', lambda path: scanned.append(path) or original_listdir(path))
+    for index in range(5):
+        write_binary_to_file(str(index).encode(), file_path, file_copy=True)
+    assert Path(tempdir.name, 'test_file-7').read_bytes() == b'existing copy'
+    assert [Path(tempdir.name, f'test_file-{count}').read_bytes() for count in range(8, 12)] == [b'1', b'2', b'3', b'4']
+    assert len(scanned) == 1, 'directory should only be scanned once'
+    write_binary_to_file(b'copy of copy', Path(tempdir.name, 'test_file-20'), file_copy=True)
+    assert Path(tempdir.name, 'test_file-20').read_bytes() == b'copy of copy'
+
+
+def _create_sparse_file(file_path, size=64 * 1024 * 1024):
+    with open(str(file_path), 'wb') as file_object:
+        file_object.seek(1024 * 1024)
+        file_object.write(b'data in the middle')
+        file_object.truncate(size)  # trailing hole
+
+
+def _copy_with_read(src_descriptor, dst_descriptor, position, count):
+    return fail_safe_file_operations._copy_chunk_with_read(src_descriptor, dst_descriptor, position, count)
+
+
+def _copy_not_supported(*_):
+    raise OSError(errno.EXDEV, 'not supported')
+
+
+@pytest.mark.parametrize('copy_functions', [None, (_copy_not_supported, _copy_with_read)])
+def test_copy_file_sparse(tempdir, monkeypatch, copy_functions):
+    if copy_functions is not None:
+        monkeypatch.setattr(fail_safe_file_operations, '_COPY_FUNCTIONS', copy_functions)
+    src_path, dst_path = Path(tempdir.name, 'image'), Path(tempdir.name, 'copy', 'image')
+    _create_sparse_file(src_path)
+    assert copy_file(src_path, dst_path) == str(dst_path)
+    assert dst_path.read_bytes() == src_path.read_bytes()
+    if src_path.stat().st_blocks * 512 < src_path.stat().st_size:  # the file system supports holes
+        assert dst_path.stat().st_blocks <= src_path.stat().st_blocks + 64, 'holes were filled'
+
+
+def test_copy_file_collisions(tempdir):
+    src_path, dst_path = Path(tempdir.name, 'source'), Path(tempdir.name, 'test_folder', 'test_file')
+    src_path.write_bytes(b'first')
+    assert copy_file(src_path, dst_path) == str(dst_path)
+    src_path.write_bytes(b'second')
+    assert copy_file(src_path, dst_path) is None
+    assert dst_path.read_bytes() == b'first'
+    assert copy_file(src_path, dst_path, file_copy=True) == f'{dst_path}-1'
+    assert Path(f'{dst_path}-1').read_bytes() == b'second'
+    assert copy_file(src_path, dst_path, overwrite=True, fsync=True) == str(dst_path)
+    assert dst_path.read_bytes() == b'second'
+    assert sorted(os.listdir(str(dst_path.parent))) == ['test_file', 'test_file-1'], 'temporary files left'
+    with pytest.raises(ValueError):
+        copy_file(src_path, dst_path, overwrite=True, file_copy=True)
+
+
+def test_copy_file_metadata(tempdir):
+    src_path = Path(tempdir.name, 'source')
+    src_path.write_bytes(b'content')
+    os.chmod(str(src_path), 0o640)
+    os.utime(str(src_path), ns=(1_000_000_000, 2_000_000_000))
+    copy_file(src_path, Path(tempdir.name, 'copy'))
+    assert oct(Path(tempdir.name, 'copy').stat().st_mode & 0o777) == oct(0o640)
+    assert Path(tempdir.name, 'copy').stat().st_mtime_ns == 2_000_000_000
+    copy_file(src_path, Path(tempdir.name, 'plain_copy'), metadata=False)
+    assert Path(tempdir.name, 'plain_copy').stat().st_mtime_ns != 2_000_000_000
+
+
+def test_copy_file_symlink(tempdir):
+    target = Path(tempdir.name, 'target')
+    target.write_bytes(b'content')
+    Path(tempdir.name, 'link').symlink_to('target')
+    Path(tempdir.name, 'broken_link').symlink_to('none_existing')
+    assert copy_file(Path(tempdir.name, 'link'), Path(tempdir.name, 'link_copy')) is not None
+    assert os.readlink(str(Path(tempdir.name, 'link_copy'))) == 'target'
+    assert copy_file(Path(tempdir.name, 'broken_link'), Path(tempdir.name, 'link_copy'), overwrite=True) is not None
+    assert os.readlink(str(Path(tempdir.name, 'link_copy'))) == 'none_existing'
+    assert copy_file(Path(tempdir.name, 'link'), Path(tempdir.name, 'link_copy'), file_copy=True) == str(Path(tempdir.name, 'link_copy-1'))
+    assert os.readlink(str(Path(tempdir.name, 'link_copy-1'))) == 'target'
+    assert copy_file(Path(tempdir.name, 'link'), Path(tempdir.name, 'file_copy'), follow_symlinks=True) is not None
+    assert not Path(tempdir.name, 'file_copy').is_symlink()
+    assert Path(tempdir.name, 'file_copy').read_bytes() == b'content'
+
+
+def test_copy_file_error(tempdir):
+    assert copy_file(Path(tempdir.name, 'none_existing'), Path(tempdir.name, 'copy')) is None
+    assert copy_file(Path(tempdir.name), Path(tempdir.name, 'copy')) is None
+    assert os.listdir(tempdir.name) == []
+
+
+def test_split_file_counter():
+    assert _split_file_counter('bar') == ('bar', 0), "simple case"
+    assert _split_file_counter('bar-11') == ('bar', 11), "simple count two digits"
+    assert _split_file_counter('bar-') == ('bar-', 0)
+    assert _split_file_counter('foo-34.bin') == ('foo-34.bin', 0), "counter only at the end"
+
+
+def test_counted_file_path_index_reserve(tempdir):
+    index = _CountedFilePathIndex()
+    file_path = os.path.join(tempdir.name, 'bar')
+    assert index.reserve(file_path) == f'{file_path}-1', "simple case"
+    assert index.reserve(f'{file_path}-11') == f'{file_path}-12', "simple count two digits"
+    assert index.reserve(file_path) == f'{file_path}-13', "highest counter in use"
+    assert os.path.exists(f'{file_path}-13'), "reserved path is created"
+    sub_directory = os.path.join(tempdir.name, 'foo-34')
+    os.mkdir(sub_directory)
+    assert index.reserve(os.path.join(sub_directory, 'bar')) == os.path.join(sub_directory, 'bar-1'), "complex case"
 
 
 def test_delete_file(tempdir):
@@ -125,6 +311,31 @@ def test_get_safe_name():
     assert len(get_safe_name(b)) == 200, "lenght not cutted correctly"
 
 
+@pytest.mark.parametrize('file_name, valid_characters', [
+    ('/()=Hello%&World!? Foo', 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_+. '),
+    ('ümläut €uro 😀 tab\tnull\x00', 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_+. '),
+    ('spaces and_underscores', 'abc '),
+    ('ümläut €uro', 'üä€ '),
+    ('anything', ''),
+])
+def test_get_safe_name_matches_character_filter(file_name, valid_characters):
+    expected = ''.join(character for character in file_name if character in valid_characters).replace(' ', '_')
+    assert get_safe_name(file_name, valid_characters=valid_characters) == expected
+    assert get_safe_name(file_name, max_size=3, valid_characters=valid_characters) == expected[:3]
+
+
+def test_get_safe_names():
+    file_names = ['a b', 'a?b', 'a_b', 'a_b-1', 'c', 250 * 'x', 250 * 'x']
+    assert get_safe_names(file_names) == [get_safe_name(file_name) for file_name in file_names]
+    assert get_safe_names(file_names, deduplicate=True) == ['a_b', 'ab', 'a_b-2', 'a_b-1', 'c', 200 * 'x', 198 * 'x' + '-1']
+    assert get_safe_names(iter([])) == []
+    assert get_safe_names(['ab', 'ab', 'ab'], max_size=2, deduplicate=True) == ['ab', '-1', '-2']
+    with pytest.raises(ValueError):
+        get_safe_names(['ab', 'ab'], max_size=1, deduplicate=True)
+    with pytest.raises(ValueError):
+        get_safe_names(['a'] * 12, max_size=2, deduplicate=True)  # '-10' exceeds max_size
+
+
 def test_get_files_in_dir(create_symlinks):
     test_dir_path = os.path.join(get_directory_of_current_file(), "data")
     result = get_files_in_dir(test_dir_path)
@@ -138,6 +349,25 @@ def test_get_files_in_dir_error():
     assert result == [], "error result should be an empty list"
 
 
+@pytest.mark.parametrize('ordered', [True, False])
+def test_get_files_in_dir_parallel(create_symlinks, ordered):
+    serial_result = get_files_in_dir(TEST_DATA_DIR)
+    parallel_result = get_files_in_dir(TEST_DATA_DIR, workers=4, ordered=ordered, max_open_dirs=2)
+    if ordered:
+        assert parallel_result == serial_result
+    else:
+        assert sorted(parallel_result) == sorted(serial_result)
+
+
+def test_get_files_in_dir_parallel_relative_path(tempdir):
+    Path(tempdir.name, 'a', 'b').mkdir(parents=True)
+    Path(tempdir.name, 'a', 'b', 'file').write_bytes(b'')
+    Path(tempdir.name, 'file').write_bytes(b'')
+    relative_path = os.path.relpath(tempdir.name)
+    assert get_files_in_dir(relative_path, workers=2) == get_files_in_dir(relative_path)
+    assert get_files_in_dir('/none_existing/dir', workers=2) == []
+
+
 def test_get_dirs(tempdir):
     test_dirs = ["dir_1", "dir_2", "dir_1/sub_dir"]
     for item in test_dirs:
@@ -152,6 +382,51 @@ def test_get_dirs_in_dir_error():
     assert result == [], "error result should be an empty list"
 
 
+@pytest.fixture(scope='function')
+def file_tree(tempdir):
+    for file_path in ['a.txt', 'b.bin', 'sub/c.txt', 'sub/deeper/d.txt', 'skip/e.txt']:
+        write_binary_to_file(b'', os.path.join(tempdir.name, file_path))
+    return tempdir.name
+
+
+def test_iter_files_in_dir(create_symlinks):
+    result = iter_files_in_dir(TEST_DATA_DIR)
+    assert not isinstance(result, list)
+    assert list(result) == get_files_in_dir(TEST_DATA_DIR)
+
+
+def test_iter_files_in_dir_filters(file_tree):
+    def relative_result(**kwargs):
+        return [os.path.relpath(path, file_tree) for path in iter_files_in_dir(file_tree, sort=True, **kwargs)]
+
+    assert relative_result() == ['a.txt', 'b.bin', 'skip/e.txt', 'sub/c.txt', 'sub/deeper/d.txt']
+    assert relative_result(max_depth=1) == ['a.txt', 'b.bin']
+    assert relative_result(max_depth=0) == relative_result(max_depth=-1) == []
+    assert relative_result(max_depth=2, include='*.txt') == ['a.txt', 'skip/e.txt', 'sub/c.txt']
+    assert relative_result(exclude=['skip', 'sub/deeper']) == ['a.txt', 'b.bin', 'sub/c.txt']
+    assert relative_result(include=re.compile(r'^sub/'), exclude=re.compile(r'\.bin$')) == ['sub/c.txt', 'sub/deeper/d.txt']
+
+
+def test_iter_files_in_dir_excluded_dirs_are_not_entered(file_tree, monkeypatch):
+    scanned = []
+    original_scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or original_scandir(path))
+    list(iter_files_in_dir(file_tree, exclude='sub'))
+    assert scanned and os.path.join(file_tree, 'sub') not in scanned
+
+
+def test_iter_files_in_dir_error():
+    assert list(iter_files_in_dir('/none_existing/dir')) == []
+
+
+def test_iter_dirs_in_dir(file_tree):
+    assert sorted(iter_dirs_in_dir(file_tree)) == sorted(get_dirs_in_dir(file_tree))
+    result = list(iter_dirs_in_dir(file_tree, max_depth=None, exclude='skip', sort=True))
+    assert result == [os.path.join(file_tree, 'sub'), os.path.join(file_tree, 'sub', 'deeper')]
+    assert list(iter_dirs_in_dir(file_tree, max_depth=0)) == list(iter_dirs_in_dir(file_tree, max_depth=-1)) == []
+    assert list(iter_dirs_in_dir('/none_existing/dir')) == []
+
+
 def test_get_dir_of_file_relative_path():
     relative_path_result = get_dir_of_file("test/some_file")
     expected_result = os.path.join(os.getcwd(), "test")
@@ -188,3 +463,46 @@ def test_safe_rglob_empty_dir():
     assert EMPTY_FOLDER.exists()
     result = safe_rglob(EMPTY_FOLDER)
     assert len(list(result)) == 0
+
+
+@pytest.mark.parametrize('symlinks, directories', [
+    (True, True),
+    (False, True),
+    (True, False),
+    (False, False),
+])
+def test_safe_scandir(create_symlinks, symlinks, directories):
+    rglob_result = list(safe_rglob(TEST_DATA_DIR, include_symlinks=symlinks, include_directories=directories))
+    scandir_result = list(safe_scandir(TEST_DATA_DIR, include_symlinks=symlinks, include_directories=directories))
+    assert [Path(entry.path) for entry in scandir_result] == rglob_result
+    read_test_entry = next(entry for entry in scandir_result if entry.name == 'read_test')
+    assert read_test_entry.stat().st_size == 14
+
+
+def test_safe_scandir_deep_tree(tempdir):
+    path = Path(tempdir.name)
+    for _ in range(1100):  # deeper than the default recursion limit
+        path = path / 'd'
+        path.mkdir()
+    (path / 'file').write_bytes(b'')
+    try:
+        result = list(safe_rglob(Path(tempdir.name), include_directories=False))
+        assert result == [path / 'file']
+    finally:  # clean up bottom-up, as shutil.rmtree is recursive as well
+        (path / 'file').unlink()
+        while path != Path(tempdir.name):
+            path.rmdir()
+            path = path.parent
+
+
+def test_safe_scandir_permission_error(tempdir):
+    locked_dir = Path(tempdir.name, 'locked')
+    (locked_dir / 'sub').mkdir(parents=True)
+    locked_dir.chmod(0)
+    try:
+        if os.access(str(locked_dir), os.R_OK):
+            pytest.skip('permissions are not enforced (running as root?)')
+        result = list(safe_rglob(Path(tempdir.name)))
+        assert result == [locked_dir]
+    finally:
+        locked_dir.chmod(0o755)
@@ -0,0 +1,77 @@
+import hashlib
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from common_helper_files import FileCache, get_file_digest
+
+TEST_DATA_DIR = Path(__file__).absolute().parent / 'data'
+
+
+@pytest.fixture(scope='function')
+def tempdir():
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        yield Path(tmp_dir)
+
+
+def test_get_file_digest():
+    assert get_file_digest(TEST_DATA_DIR / 'read_test') == hashlib.sha256(b'this is a test').hexdigest()
+    assert get_file_digest(TEST_DATA_DIR / 'read_test', 'md5', chunk_size=3) == hashlib.md5(b'this is a test').hexdigest()
+    assert get_file_digest(TEST_DATA_DIR / 'link_test') == hashlib.sha256(b'symbolic link -> read_test').hexdigest()
+    assert get_file_digest(TEST_DATA_DIR / 'none_existing_file') == ''
+    assert get_file_digest(TEST_DATA_DIR / 'read_test', 'no_such_algorithm') == ''
+
+
+def test_cached_read(tempdir):
+    test_file = tempdir / 'file'
+    test_file.write_bytes(b'first')
+    cache = FileCache()
+    assert cache.get_binary_from_file(test_file) == b'first'
+    assert cache.get_binary_from_file(str(test_file)) == b'first'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    test_file.write_bytes(b'second content')
+    assert cache.get_binary_from_file(test_file) == b'second content'
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    assert cache.get_binary_from_file(TEST_DATA_DIR / 'link_test') == 'symbolic link -> read_test'
+    assert cache.get_binary_from_file(tempdir / 'none_existing_file') == b''
+    assert cache.get_binary_from_file(os.devnull) == b''
+
+
+def test_cache_eviction(tempdir):
+    cache = FileCache(max_bytes=25)
+    for index in range(4):
+        (tempdir / str(index)).write_bytes(10 * b'x')
+        cache.get_binary_from_file(tempdir / str(index))
+    statistics = cache.get_statistics()
+    assert (statistics['cached_files'], statistics['cached_bytes']) == (2, 20)
+    cache.get_binary_from_file(tempdir / '3')
+    cache.get_binary_from_file(tempdir / '0')
+    assert (cache.hits, cache.misses) == (1, 5)
+
+
+def test_cached_digest(tempdir):
+    test_file = tempdir / 'file'
+    test_file.write_bytes(b'content')
+    cache = FileCache()
+    cache.get_binary_from_file(test_file)
+    assert cache.get_file_digest(test_file) == hashlib.sha256(b'content').hexdigest()
+    assert cache.get_file_digest(test_file) == hashlib.sha256(b'content').hexdigest()
+    assert cache.get_file_digest(test_file, 'md5') == hashlib.md5(b'content').hexdigest()
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert cache.get_file_digest(TEST_DATA_DIR / 'link_test') == get_file_digest(TEST_DATA_DIR / 'link_test')
+    assert cache.get_file_digest(tempdir / 'none_existing_file') == ''
+
+
+def test_persistent_digest_index(tempdir):
+    test_file, index_path = tempdir / 'file', tempdir / 'index.db'
+    test_file.write_bytes(b'content')
+    with FileCache(index_path=index_path) as cache:
+        digest = cache.get_file_digest(test_file)
+    with FileCache(index_path=index_path) as cache:
+        assert cache.get_file_digest(test_file) == digest
+        assert (cache.hits, cache.misses) == (1, 0)
+    assert FileCache(index_path=tempdir / 'no_dir' / 'index.db').get_file_digest(test_file) == digest
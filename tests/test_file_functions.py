@@ -1,8 +1,9 @@
-import pytest
+import io
 import os
 
+import pytest
 
-from common_helper_files import human_readable_file_size, read_in_chunks, get_directory_for_filename
+from common_helper_files import get_directory_for_filename, human_readable_file_size, read_in_chunks, read_into_chunks
 
 TEST_DATA_DIR = os.path.join(get_directory_for_filename(__file__), 'data')
 
@@ -12,14 +13,54 @@ TEST_DATA_DIR = os.path.join(get_directory_for_filename(__file__), 'data')
     (1024, '1.00 KiB'),
     (1024 * 1024, '1.00 MiB'),
     (1234.1234, '1.21 KiB'),
+    (0, '0.00 Byte'),
+    (5 * 1024 ** 3 + 7, '5.00 GiB'),
+    (-2048, '-2.00 KiB'),
+    (1024 ** 9, '1024.00 YiB'),
 ])
 def test_human_readable_file_size(input_data, expected):
     assert human_readable_file_size(input_data) == expected
 
 
+def test_human_readable_file_size_bitmath():
+    bitmath = pytest.importorskip('bitmath')
+    assert human_readable_file_size(bitmath.MiB(3)) == '3.00 MiB'
+
+
 def test_read_in_chunks():
     fp = open(TEST_DATA_DIR + '/read_test', 'rb')
     test_buffer = b''
     for chunk in read_in_chunks(fp):
         test_buffer += chunk
     assert test_buffer == b'this is a test'
+
+
+class ReadOnlyStream:
+    def __init__(self, data):
+        self.read = io.BytesIO(data).read
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 3, 1024])
+def test_read_into_chunks(chunk_size):
+    with open(TEST_DATA_DIR + '/read_test', 'rb') as fp:
+        chunks = [bytes(chunk) for chunk in read_into_chunks(fp, chunk_size=chunk_size)]
+    assert b''.join(chunks) == b'this is a test'
+    assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+
+
+def test_read_into_chunks_overlap():
+    with open(TEST_DATA_DIR + '/read_test', 'rb') as fp:
+        chunks = [bytes(chunk) for chunk in read_into_chunks(fp, chunk_size=5, overlap=2)]
+    assert chunks == [b'this ', b's is a ', b'a test']
+    with pytest.raises(ValueError):
+        list(read_into_chunks(io.BytesIO(b''), chunk_size=5, overlap=5))
+
+
+def test_read_into_chunks_input_types():
+    file_descriptor = os.open(TEST_DATA_DIR + '/read_test', os.O_RDONLY)
+    try:
+        assert b''.join(bytes(chunk) for chunk in read_into_chunks(file_descriptor, chunk_size=4)) == b'this is a test'
+    finally:
+        os.close(file_descriptor)
+    assert b''.join(bytes(chunk) for chunk in read_into_chunks(ReadOnlyStream(b'this is a test'), chunk_size=4)) == b'this is a test'
+    assert b''.join(bytes(chunk) for chunk in read_into_chunks(io.BytesIO(b'this is a test'))) == b'this is a test'
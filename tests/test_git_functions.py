@@ -1,6 +1,101 @@
-from common_helper_files import get_version_string_from_git
+import subprocess
+
+import pytest
+
+from common_helper_files import get_version_string_from_git, write_version_file
+from common_helper_files import git_functions
 
 
 def test_get_version_string_from_git():
     result = get_version_string_from_git('.')
     assert type(result) == str
+
+
+def _git(repository, *args):
+    return subprocess.check_output(['git', *args], cwd=str(repository), env={
+        'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.com', 'GIT_AUTHOR_DATE': '2020-01-01T00:00:00',
+        'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.com', 'GIT_COMMITTER_DATE': '2020-01-01T00:00:00',
+        'HOME': str(repository), 'PATH': '/usr/bin:/bin:/usr/local/bin',
+    }).strip().decode()
+
+
+def _commit(repository, message='commit'):
+    (repository / 'file').write_text(message)
+    _git(repository, 'add', 'file')
+    _git(repository, 'commit', '-q', '-m', message)
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.delenv('XDG_CONFIG_HOME', raising=False)
+    monkeypatch.setattr(git_functions, '_VERSION_CACHE', {})
+    _git(tmp_path, 'init', '-q')
+    _commit(tmp_path, 'first')
+    (tmp_path / 'sub').mkdir()
+    return tmp_path
+
+
+def _describe_without_git(repository):
+    return git_functions._GitRepository.find(str(repository)).describe()
+
+
+@pytest.mark.parametrize('setup', [
+    lambda repository: None,
+    lambda repository: _git(repository, 'tag', 'lightweight'),
+    lambda repository: _git(repository, 'tag', '-a', '-m', 'release', 'v1.0'),
+    lambda repository: _git(repository, 'tag', '-a', '-m', 'release', 'releases/v2'),
+    lambda repository: (_git(repository, 'tag', '-a', '-m', 'release', 'v1.0'), _git(repository, 'pack-refs', '--all')),
+    lambda repository: (_git(repository, 'tag', '-a', '-m', 'release', 'v1.0'), _git(repository, 'gc', '-q')),
+    lambda repository: (_git(repository, 'gc', '-q'), _commit(repository, 'second')),
+    lambda repository: _git(repository, 'checkout', '-q', '--detach'),
+    lambda repository: _git(repository, 'config', 'core.abbrev', '12'),
+    lambda repository: (_git(repository, 'tag', '-a', '-m', 'release', 'v1.0'), _git(repository, 'tag', 'v1.0-light')),
+])
+def test_get_version_string_matches_git(repository, setup):
+    setup(repository)
+    expected = _git(repository, 'describe', '--always')
+    assert _describe_without_git(repository) == expected
+    assert get_version_string_from_git(str(repository / 'sub')) == expected
+
+
+def test_get_version_string_needs_history_walk(repository):
+    _git(repository, 'tag', '-a', '-m', 'release', 'v1.0')
+    _commit(repository, 'second')
+    assert _describe_without_git(repository) is None
+    assert get_version_string_from_git(str(repository)) == 'v1.0-1-g' + _git(repository, 'rev-parse', '--short', 'HEAD')
+
+
+def test_get_version_string_worktree(repository, tmp_path_factory):
+    worktree = tmp_path_factory.mktemp('worktree') / 'tree'
+    _git(repository, 'worktree', 'add', '-q', '--detach', str(worktree))
+    _git(worktree, 'tag', '-a', '-m', 'release', 'v3')
+    assert _describe_without_git(worktree) == 'v3'
+
+
+def test_get_version_string_is_cached(repository, monkeypatch):
+    expected = get_version_string_from_git(str(repository))
+    with monkeypatch.context() as patch:
+        patch.setattr(git_functions._GitRepository, 'describe', None)  # must not be read again
+        assert get_version_string_from_git(str(repository)) == expected
+
+    _commit(repository, 'second')
+    assert get_version_string_from_git(str(repository)) == _git(repository, 'describe', '--always') != expected
+    _git(repository, 'tag', '-a', '-m', 'release', 'v2')
+    assert get_version_string_from_git(str(repository)) == 'v2'
+
+
+def test_get_version_string_unborn_branch(tmp_path):
+    _git(tmp_path, 'init', '-q')
+    with pytest.raises(subprocess.CalledProcessError):
+        get_version_string_from_git(str(tmp_path))
+
+
+def test_write_version_file(repository, monkeypatch):
+    _git(repository, 'tag', '-a', '-m', 'release', 'v1.0')
+    monkeypatch.setattr(git_functions, '_describe_with_git', None)  # no subprocess needed
+    version_file = repository / 'build' / 'package' / '_version.py'
+    assert write_version_file(str(repository), version_file) == 'v1.0'
+    assert version_file.read_text() == '__version__ = \'v1.0\'\n'
+    write_version_file(str(repository), version_file, template='{version}')
+    assert version_file.read_text() == 'v1.0'
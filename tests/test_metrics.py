@@ -0,0 +1,104 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from common_helper_files import (
+    copy_tree, create_symlink, create_symlinks, delete_file, delete_files, delete_tree, get_binary_from_file,
+    get_file_digest, get_files_in_dir, iter_lines_from_file, safe_rglob, write_binary_to_file
+)
+from common_helper_files import metrics
+
+TEST_DATA_DIR = Path(__file__).absolute().parent / 'data'
+
+
+@pytest.fixture(scope='function')
+def global_metrics():
+    metrics.reset_metrics()
+    metrics.enable_metrics()
+    try:
+        yield
+    finally:
+        metrics.disable_metrics()
+        metrics.reset_metrics()
+
+
+def test_disabled_by_default():
+    metrics.reset_metrics()
+    get_binary_from_file(TEST_DATA_DIR / 'read_test')
+    assert metrics.get_metrics_summary()['read']['calls'] == 0
+
+
+def test_global_metrics(global_metrics):
+    events = []
+    callback = lambda *event: events.append(event)  # noqa: E731
+    metrics.add_metrics_callback(callback)
+    try:
+        get_binary_from_file(TEST_DATA_DIR / 'read_test')
+        get_binary_from_file(TEST_DATA_DIR / 'none_existing_file')
+    finally:
+        metrics.remove_metrics_callback(callback)
+    summary = metrics.get_metrics_summary()['read']
+    assert summary['calls'] == 2
+    assert summary['size'] == 14
+    assert summary['errors_by_type'] == {'FileNotFoundError': 1}
+    assert 0 < summary['p50'] <= summary['p99']
+    assert [event[0] for event in events] == ['read', 'read', 'read']
+    assert [event[3] for event in events] == [None, 'FileNotFoundError', None]
+
+
+def test_profile_file_operations():
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        with metrics.profile_file_operations() as profile:
+            write_binary_to_file(b'12345', Path(tmp_dir, 'file'))
+            create_symlink('file', Path(tmp_dir, 'link'))
+            create_symlink('file', Path(tmp_dir, 'link'))
+            assert len(get_files_in_dir(tmp_dir)) == 2
+            assert len(list(safe_rglob(Path(tmp_dir)))) == 2
+            delete_file(Path(tmp_dir, 'file'))
+        delete_file(Path(tmp_dir, 'link'))
+    summary = profile.get_summary()
+    assert (summary['write']['calls'], summary['write']['size']) == (1, 5)
+    assert (summary['symlink']['calls'], summary['symlink']['errors_by_type']) == (2, {'FileExistsError': 1})
+    assert (summary['walk']['calls'], summary['walk']['size']) == (2, 4)
+    assert (summary['delete']['calls'], summary['delete']['errors']) == (1, 0)
+    assert metrics.get_metrics_summary()['write']['calls'] == 0
+
+
+def test_profile_streaming_reads():
+    with metrics.profile_file_operations() as profile:
+        assert get_file_digest(TEST_DATA_DIR / 'read_test')
+        assert get_file_digest(TEST_DATA_DIR / 'none_existing_file') == ''
+        assert list(iter_lines_from_file(TEST_DATA_DIR / 'read_test')) == ['this is a test']
+        list(iter_lines_from_file(TEST_DATA_DIR / 'none_existing_file'))
+    summary = profile.get_summary()['read']
+    assert summary['calls'] == 4
+    assert summary['size'] == 14 + 15 + 1  # the failed iteration yields an empty line
+    assert summary['errors_by_type'] == {'FileNotFoundError': 2}
+
+
+def test_profile_bulk_operations(tmp_path):
+    (tmp_path / 'src').mkdir()
+    files = [tmp_path / 'src' / str(index) for index in range(3)]
+    for path in files:
+        path.write_bytes(b'content')
+    with metrics.profile_file_operations() as profile:
+        copy_tree(tmp_path / 'src', tmp_path / 'copy')
+        create_symlinks([(path, tmp_path / 'links' / path.name) for path in files] + [(files[0], files[1] / 'link')])
+        delete_files(files + [tmp_path / 'none_existing'])
+        delete_tree(tmp_path / 'links')
+    summary = profile.get_summary()
+    assert (summary['copy']['calls'], summary['copy']['size'], summary['copy']['errors']) == (1, 3, 0)
+    assert (summary['symlink']['calls'], summary['symlink']['size']) == (1, 4)
+    assert summary['symlink']['errors_by_type'] == {'FileExistsError': 1}
+    assert (summary['delete']['calls'], summary['delete']['size']) == (2, 4 + 4)
+    assert summary['delete']['errors_by_type'] == {'FileNotFoundError': 1}
+
+
+def test_percentile():
+    operation_metrics = metrics.OperationMetrics()
+    assert operation_metrics.get_percentile(50) == 0.0
+    operation_metrics.histogram[3] = 98
+    operation_metrics.histogram[10] = 2
+    assert operation_metrics.get_percentile(50) == 8e-6
+    assert operation_metrics.get_percentile(99) == 1024e-6
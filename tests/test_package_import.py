@@ -0,0 +1,44 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import common_helper_files
+
+
+def test_import_is_lazy():
+    code = (
+        'import sys, common_helper_files\n'
+        'assert not [name for name in sys.modules if name.startswith("common_helper_files.")]\n'
+        'assert "bitmath" not in sys.modules and "subprocess" not in sys.modules\n'
+        'from common_helper_files import human_readable_file_size\n'
+        'assert "common_helper_files.file_functions" in sys.modules\n'
+        'assert "common_helper_files.fail_safe_file_operations" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_all_names_resolve():
+    for name in common_helper_files.__all__:
+        assert getattr(common_helper_files, name).__name__ == name
+    assert set(common_helper_files.__all__) <= set(dir(common_helper_files))
+
+
+def test_submodules_are_attributes():
+    code = (
+        'import common_helper_files\n'
+        'assert common_helper_files.file_functions.human_readable_file_size(1) == "1.00 Byte"\n'
+        'for name in common_helper_files._SUBMODULES:\n'
+        '    assert getattr(common_helper_files, name).__name__ == f"common_helper_files.{name}"\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+    modules = {path.stem for path in Path(common_helper_files.__file__).parent.glob('*.py')} - {'__init__'}
+    assert set(common_helper_files._SUBMODULES) == modules
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError):
+        common_helper_files.none_existing_function  # pylint: disable=pointless-statement
+    with pytest.raises(ImportError):
+        from common_helper_files import none_existing_function  # noqa: F401 pylint: disable=unused-import
@@ -0,0 +1,83 @@
+import os
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from common_helper_files import FileSystemSnapshot, diff_snapshots, take_snapshot, update_snapshot
+from common_helper_files.snapshot import ENTRY_DIRECTORY, ENTRY_FILE, ENTRY_SYMLINK
+
+
+@pytest.fixture(scope='function')
+def tree():
+    with TemporaryDirectory(prefix='test_common_helper_file') as tmp_dir:
+        root = Path(tmp_dir)
+        for directory in ['a', 'a/b', 'c']:
+            (root / directory).mkdir()
+        for file_path in ['file', 'a/file', 'a/b/file', 'c/file']:
+            (root / file_path).write_bytes(file_path.encode())
+        (root / 'link').symlink_to('file')
+        yield root
+
+
+def _touch_later(path: Path, content: bytes):
+    time.sleep(0.01)  # make sure the mtime changes on file systems with coarse timestamps
+    path.write_bytes(content)
+
+
+def test_take_snapshot(tree):
+    snapshot = take_snapshot(tree)
+    entries = {entry.path: entry for entry in snapshot}
+    assert sorted(entries) == ['a', 'a/b', 'a/b/file', 'a/file', 'c', 'c/file', 'file', 'link']
+    assert entries['a'].type == ENTRY_DIRECTORY
+    assert entries['link'].type == ENTRY_SYMLINK
+    assert entries['a/file'].type == ENTRY_FILE
+    assert entries['a/file'].size == 6
+    assert entries['a/file'].inode == os.lstat(str(tree / 'a/file')).st_ino
+    assert len(take_snapshot(tree / 'none_existing')) == 0
+
+
+def test_save_and_load(tree):
+    snapshot = take_snapshot(tree)
+    snapshot.save(tree / 'snapshot')
+    loaded = FileSystemSnapshot.load(tree / 'snapshot')
+    assert loaded.root == snapshot.root
+    assert loaded.root_mtime_ns == snapshot.root_mtime_ns
+    assert list(loaded) == list(snapshot)
+    FileSystemSnapshot(tree).save(tree / 'empty')
+    assert len(FileSystemSnapshot.load(tree / 'empty')) == 0
+    with pytest.raises(ValueError):
+        FileSystemSnapshot.load(tree / 'file')
+
+
+def test_update_snapshot(tree, monkeypatch):
+    snapshot = take_snapshot(tree)
+    _touch_later(tree / 'a/b/new', b'new')
+    (tree / 'c/file').unlink()
+    (tree / 'file').unlink()
+    _touch_later(tree / 'file', b'replaced')
+
+    scanned = []
+    original_scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or original_scandir(path))
+    updated, diff = update_snapshot(snapshot)
+    assert sorted(os.path.relpath(path, str(tree)) for path in scanned) == ['.', 'a/b', 'c']
+    assert diff.added == ['a/b/new']
+    assert diff.removed == ['c/file']
+    assert sorted(diff.modified) == ['a/b', 'c', 'file']
+    assert sorted(entry.path for entry in updated) == sorted(entry.path for entry in take_snapshot(tree))
+
+
+def test_update_snapshot_check_files(tree):
+    snapshot = take_snapshot(tree)
+    with (tree / 'a/file').open('ab') as file_object:
+        file_object.write(b'appended')
+    assert update_snapshot(snapshot)[1].modified == []
+    assert update_snapshot(snapshot, check_files=True)[1].modified == ['a/file']
+
+
+def test_diff_snapshots(tree):
+    snapshot = take_snapshot(tree)
+    assert diff_snapshots(snapshot, snapshot) == ([], [], [])
+    assert diff_snapshots(FileSystemSnapshot(tree), snapshot).added == snapshot.paths
@@ -0,0 +1,85 @@
+import os
+import time
+
+import pytest
+
+from common_helper_files import map_files, map_files_in_dir
+
+
+def get_length(binary):
+    return len(binary)
+
+
+def fail_on_x(binary):
+    if binary.startswith(b'x'):
+        raise ValueError('x found')
+    return len(binary)
+
+
+def sleep_on_x(binary):
+    if binary.startswith(b'x'):
+        time.sleep(10)
+    return len(binary)
+
+
+def crash_on_x(binary):
+    if binary.startswith(b'x'):
+        os._exit(1)
+    return len(binary)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for index in range(20):
+        path = tmp_path / f'dir_{index % 3}' / f'file_{index}'
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(index * b'a')
+    (tmp_path / 'symlink').symlink_to(tmp_path / 'dir_0' / 'file_3')
+    return tmp_path
+
+
+@pytest.mark.parametrize('workers, batch_bytes, batch_files', [(1, 1024, 256), (2, 10, 256), (3, 1024, 1)])
+def test_map_files_in_dir(tree, workers, batch_bytes, batch_files):
+    results = list(map_files_in_dir(get_length, tree, workers=workers, batch_bytes=batch_bytes, batch_files=batch_files))
+    assert sorted((os.path.basename(result.path), result.result, result.error) for result in results) == sorted(
+        (f'file_{index}', index, None) for index in range(20)
+    )
+
+
+def test_map_files_in_dir_symlinks(tree):
+    results = {os.path.basename(result.path): result.result for result in map_files_in_dir(get_length, tree, include_symlinks=True, workers=2)}
+    assert results['symlink'] == len(f'symbolic link -> {tree / "dir_0" / "file_3"}')
+
+
+def test_map_files_ordered(tree):
+    paths = sorted(str(path) for path in tree.glob('dir_*/*'))
+    results = list(map_files(get_length, paths, workers=2, ordered=True, batch_files=3))
+    assert [result.path for result in results] == paths
+
+
+def test_map_files_errors(tree):
+    (tree / 'x').write_bytes(b'xxx')
+    paths = [tree / 'dir_0' / 'file_3', tree / 'x', tree / 'none_existing']
+    results = list(map_files(fail_on_x, paths, workers=2, ordered=True))
+    assert [(result.result, result.error) for result in results] == [
+        (3, None), (None, 'ValueError: x found'), (None, f'FileNotFoundError: [Errno 2] No such file or directory: \'{tree / "none_existing"}\''),
+    ]
+
+
+def test_map_files_timeout(tree):
+    (tree / 'x').write_bytes(b'xxx')
+    start = time.perf_counter()
+    results = list(map_files(sleep_on_x, [tree / 'x', tree / 'dir_0' / 'file_3'], workers=1, ordered=True, timeout=0.2))
+    assert time.perf_counter() - start < 5
+    assert results[0].error.startswith('TimeoutError')
+    assert results[1].result == 3
+
+
+def test_map_files_crashed_worker(tree):
+    (tree / 'x').write_bytes(b'xxx')
+    paths = [str(path) for path in sorted(tree.glob('dir_*/*'))]
+    paths.insert(5, str(tree / 'x'))
+    results = list(map_files(crash_on_x, paths, workers=2, ordered=True, batch_files=1))
+    assert [result.path for result in results] == paths
+    assert [result.path for result in results if result.error is not None] == [str(tree / 'x')]
+    assert results[5].error.startswith('BrokenProcessPool')